@@ -1,52 +1,38 @@
 import logfire
 import asyncio
-import hashlib
-import json
-from pathlib import Path
-from pydantic import ValidationError
-from pydantic_ai import Agent, BinaryContent
 import os
+import blake3
+import httpx
+import orjson
+import statistics
+import weakref
+from contextlib import nullcontext
+from collections import OrderedDict
+from functools import lru_cache
+import openai
+from openai import AsyncOpenAI
+from pydantic import ValidationError
+from pydantic_ai import Agent, BinaryContent, NativeOutput
+from pydantic_ai.exceptions import ModelHTTPError
+from pydantic_ai.models.openai import OpenAIModel
+from pydantic_ai.profiles.openai import OpenAIJsonSchemaTransformer
+from pydantic_ai.providers.openai import OpenAIProvider
 from typing import Any
 
-from models import JobRequirements, CVAnalysis, MatchingScore
-from prompts import job_requirements_prompt, cv_review_prompt, scoring_prompt
+from models import JobRequirements, CVAnalysis, MatchingScore, CVAnalysisWithScore
 from enhanced_prompts import enhanced_prompts
-from cache_utils import shared_cache
-
-# Configure logfire logging
-logfire.configure()
-logfire.instrument_pydantic_ai()
-
-# Concurrency-safe API key swap lock
-_key_lock = asyncio.Lock()
+from cache_utils import batch_cache, shared_cache
+import semantic_cache
+import batcher
+import pdf_extract
 
-class _ApiKeyContext:
-    """
-    Async context manager to temporarily set OPENAI_API_KEY process env
-    for the duration of a single LLM call. Uses a global asyncio.Lock to
-    avoid races across concurrent requests.
-    """
-    def __init__(self, api_key: str | None):
-        self.api_key = api_key
-        self._old = None
-
-    async def __aenter__(self):
-        if not self.api_key:
-            return
-        await _key_lock.acquire()
-        self._old = os.environ.get("OPENAI_API_KEY")
-        os.environ["OPENAI_API_KEY"] = self.api_key
-
-    async def __aexit__(self, exc_type, exc, tb):
-        try:
-            if self.api_key is not None:
-                if self._old is None:
-                    os.environ.pop("OPENAI_API_KEY", None)
-                else:
-                    os.environ["OPENAI_API_KEY"] = self._old
-        finally:
-            if _key_lock.locked():
-                _key_lock.release()
+# Configure logfire logging once per process; a re-import (e.g. worker reload)
+# must not re-instrument pydantic-ai or register duplicate span exporters.
+# The flag lives on the logfire module so it survives this module being reloaded.
+if not getattr(logfire, "_resume_checker_configured", False):
+    logfire.configure()
+    logfire.instrument_pydantic_ai()
+    logfire._resume_checker_configured = True
 
 # --- Agent Definitions ---
 """Agent and LLM configuration.
@@ -57,7 +43,7 @@ Notes:
 """
 
 # Bump this when changing prompts/model settings to invalidate caches safely
-AGENT_VERSION = "v4"
+AGENT_VERSION = "v6"
 
 # Base/default model settings used for all tasks
 _DEFAULT_MODEL_SETTINGS = {
@@ -65,62 +51,347 @@ _DEFAULT_MODEL_SETTINGS = {
     'max_tokens': 4000,
 }
 
-# Small in-process cache of Agent instances, keyed with versioning to avoid collisions
-_AGENT_CACHE: dict[tuple[str, str, str, str], Agent] = {}
+# Per-API-key clients/models, plus shared agents. The key is passed explicitly to each client
+# instead of being swapped into os.environ, so calls with different keys run
+# concurrently. Caches are LRU-bounded so many distinct keys cannot grow them forever.
+_CACHE_MAX_ENTRIES = 128
+
+_CLIENT_CACHE: "OrderedDict[str, AsyncOpenAI]" = OrderedDict()
+_MODEL_CACHE: "OrderedDict[tuple[str, str, str], OpenAIModel]" = OrderedDict()
+_AGENT_CACHE: "OrderedDict[tuple[str, str, str], Agent]" = OrderedDict()
+
+def _lru_get(cache: OrderedDict, key):
+    value = cache.get(key)
+    if value is not None:
+        cache.move_to_end(key)
+    return value
+
+def _lru_set(cache: OrderedDict, key, value) -> None:
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > _CACHE_MAX_ENTRIES:
+        cache.popitem(last=False)
+
+@lru_cache(maxsize=_CACHE_MAX_ENTRIES)
+def _api_key_hash(api_key: str | None) -> str:
+    # Never keep raw keys in cache keys; empty string means "server env fallback".
+    # Memoized per process (same bound as the client LRU, which holds the raw key
+    # anyway) so the model and client lookups of every call hash a key only once.
+    return _digest(api_key.encode("utf-8")) if api_key else ""
+
+# One connection pool shared by every per-key client: the httpx default (10 connections)
+# would otherwise cap concurrent LLM calls, and HTTP/2 multiplexes requests per connection.
+# Evicted per-key clients don't own it, so eviction never closes live connections.
+# LLM_HTTP_MAX_CONNECTIONS raises the cap for bursty deployments (each HTTP/2
+# connection already carries many concurrent requests).
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100"))
+_shared_httpx = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(
+        max_connections=LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_HTTP_MAX_CONNECTIONS,
+        keepalive_expiry=30,
+    ),
+    timeout=httpx.Timeout(90.0, connect=5.0),
+)
+
+# Opt-in snapshot of vacancy analyses across restarts. Only the vacancy stage is
+# persisted: job postings are public, while CV-derived results must never be
+# written to disk (no server-side retention of CV data).
+CACHE_SNAPSHOT_PATH = os.getenv("CACHE_SNAPSHOT_PATH", "").strip()
 
-def _model_string(provider: str, model: str | None) -> str:
-    p = (provider or 'openai').lower()
-    if not model or not model.strip():
-        # sensible defaults
-        return 'openai:gpt-4o'
-    return f"{p}:{model.strip()}"
+def save_cache_snapshot(path: str = CACHE_SNAPSHOT_PATH) -> int:
+    """Write live `vacancy:` cache entries to `path` (atomic replace); returns the entry count."""
+    if not path:
+        return 0
+    entries = [
+        [key, age, value.model_dump(mode="json")]
+        for key, age, value in shared_cache.snapshot(f"vacancy:{AGENT_VERSION}:")
+    ]
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(entries))
+    os.replace(tmp_path, path)
+    return len(entries)
 
-def _get_agent(task: str, provider: str | None, model: str | None):
+def load_cache_snapshot(path: str = CACHE_SNAPSHOT_PATH) -> int:
+    """Load a snapshot written by save_cache_snapshot; stale versions and bad entries are skipped."""
+    if not path or not os.path.exists(path):
+        return 0
+    try:
+        with open(path, "rb") as f:
+            raw = orjson.loads(f.read())
+        entries = [
+            (key, age, JobRequirements.model_validate(data))
+            for key, age, data in raw
+            if key.startswith(f"vacancy:{AGENT_VERSION}:")
+        ]
+    except (OSError, ValueError) as e:
+        logfire.warn(f"Ignoring unreadable cache snapshot {path}: {e}")
+        return 0
+    return shared_cache.restore(entries)
+
+async def aclose_http_client() -> None:
+    """Close the shared connection pool (call on app shutdown)."""
+    await _shared_httpx.aclose()
+
+def get_openai_client(api_key: str | None = None) -> AsyncOpenAI:
+    """Return a cached AsyncOpenAI client for the given key (None -> server OPENAI_API_KEY)."""
+    key = _api_key_hash(api_key)
+    client = _lru_get(_CLIENT_CACHE, key)
+    if client is None:
+        # max_retries=0: _run_with_retries owns retries (transient errors only,
+        # Retry-After aware, inside the per-attempt timeout); SDK retries on top
+        # of it multiplied the attempts and could outlive that timeout
+        if api_key:
+            client = AsyncOpenAI(api_key=api_key, http_client=_shared_httpx, max_retries=0)
+        else:
+            client = AsyncOpenAI(http_client=_shared_httpx, max_retries=0)
+        _lru_set(_CLIENT_CACHE, key, client)
+    return client
+
+def _get_model(provider: str | None, model: str | None, api_key: str | None) -> OpenAIModel:
     provider_norm = (provider or 'openai').lower()
     model_norm = (model or '').strip() or 'gpt-4o'
-    settings = _DEFAULT_MODEL_SETTINGS
-    # Include version in cache key to avoid stale agents when prompts/settings change
-    key = (task, provider_norm, model_norm, AGENT_VERSION)
-    if key in _AGENT_CACHE:
-        return _AGENT_CACHE[key]
-    model_id = _model_string(provider_norm, model_norm)
-    # NOTE: If enabling enhanced prompts, select per-task prompt here based on env/inputs
-    if task == 'job':
-        agent = Agent(model_id, output_type=JobRequirements, system_prompt=job_requirements_prompt, model_settings=settings)
-    elif task == 'cv':
-        agent = Agent(model_id, output_type=CVAnalysis, system_prompt=cv_review_prompt, model_settings=settings)
-    elif task == 'score':
-        agent = Agent(model_id, output_type=MatchingScore, system_prompt=scoring_prompt, model_settings=settings)
-    else:
+    if provider_norm != 'openai':
+        raise ValueError(f"LLM provider '{provider_norm}' not supported yet")
+    key = (provider_norm, model_norm, _api_key_hash(api_key))
+    llm = _lru_get(_MODEL_CACHE, key)
+    if llm is None:
+        llm = OpenAIModel(model_norm, provider=OpenAIProvider(openai_client=get_openai_client(api_key)))
+        _lru_set(_MODEL_CACHE, key, llm)
+    return llm
+
+# Output type per task; agents are built without a model (passed per run) so one
+# agent per (task, system prompt) is shared across API keys and models.
+# NativeOutput sends a strict json_schema response_format, so the model's JSON is
+# schema-conformant by construction instead of validated (and retried) after the fact.
+_TASK_OUTPUT_TYPES: dict[str, Any] = {
+    'job': NativeOutput(JobRequirements, strict=True),
+    'job_batch': NativeOutput(list[JobRequirements], strict=True),
+    'cv': NativeOutput(CVAnalysis, strict=True),
+    'score': NativeOutput(MatchingScore, strict=True),
+    'score_batch': NativeOutput(list[MatchingScore], strict=True),
+    'cvscore': NativeOutput(CVAnalysisWithScore, strict=True),
+}
+
+# Per-task output budgets sized to each schema; oversized max_tokens only reserves
+# server-side capacity. Batched job/score calls scale 'job'/'score' by the batch size.
+_TASK_MODEL_SETTINGS: dict[str, dict[str, Any]] = {
+    'job': {**_DEFAULT_MODEL_SETTINGS, 'max_tokens': 1500},
+    'cv': {**_DEFAULT_MODEL_SETTINGS, 'max_tokens': 3000},
+    'score': {**_DEFAULT_MODEL_SETTINGS, 'max_tokens': 1000},
+    'cvscore': {**_DEFAULT_MODEL_SETTINGS, 'max_tokens': 4000},
+}
+
+def task_model_settings(task: str) -> dict[str, Any]:
+    return _TASK_MODEL_SETTINGS.get(task, _DEFAULT_MODEL_SETTINGS)
+
+# Prompt without job context never changes; build it once
+_DEFAULT_CV_PROMPT = enhanced_prompts.get_cv_analysis_prompt(None)
+
+# Strict JSON schemas derived once at import for the batch pipeline: the same
+# transform NativeOutput(strict=True) applies, so batch outputs are held to the
+# schema exactly like interactive ones
+OUTPUT_JSON_SCHEMAS: dict[type, dict[str, Any]] = {
+    model_cls: OpenAIJsonSchemaTransformer(model_cls.model_json_schema(), strict=True).walk()
+    for model_cls in (JobRequirements, CVAnalysis, MatchingScore, CVAnalysisWithScore)
+}
+
+def _get_agent(task: str, system_prompt: str) -> Agent:
+    # Include version in cache key to avoid stale agents when prompts/settings change.
+    # Keyed by the prompt itself: the prompts are interned once per (kind, category),
+    # so the string's hash is cached and lookups neither encode nor digest it.
+    key = (task, system_prompt, AGENT_VERSION)
+    agent = _lru_get(_AGENT_CACHE, key)
+    if agent is not None:
+        return agent
+    if task not in _TASK_OUTPUT_TYPES:
         raise ValueError(f"Unknown task '{task}'")
-    _AGENT_CACHE[key] = agent
+    agent = Agent(output_type=_TASK_OUTPUT_TYPES[task], system_prompt=system_prompt, model_settings=task_model_settings(task))
+    _lru_set(_AGENT_CACHE, key, agent)
     return agent
 
-async def _run_with_retries(run_coro_factory, timeout: float, *, attempts: int = 3) -> Any:
+# Transient failures worth retrying; anything else (validation errors, bad input, auth) fails fast
+_RETRYABLE_EXCEPTIONS = (
+    asyncio.TimeoutError,
+    openai.APIConnectionError,  # includes APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+# Never sleep longer than this on a server-provided Retry-After
+_MAX_RETRY_AFTER_SECONDS = 20.0
+
+def _is_retryable(e: Exception) -> bool:
+    if isinstance(e, _RETRYABLE_EXCEPTIONS):
+        return True
+    # pydantic-ai wraps OpenAI status errors in ModelHTTPError
+    return isinstance(e, ModelHTTPError) and e.status_code in _RETRYABLE_STATUS
+
+def _retry_after(e: Exception) -> float | None:
+    """Seconds requested by the server's Retry-After headers, if any (checks the wrapped OpenAI error too)."""
+    for err in (e, e.__cause__):
+        response = getattr(err, "response", None)
+        headers = getattr(response, "headers", None)
+        if not headers:
+            continue
+        try:
+            if headers.get("retry-after-ms"):
+                return float(headers["retry-after-ms"]) / 1000
+            if headers.get("retry-after"):
+                return float(headers["retry-after"])
+        except (TypeError, ValueError):
+            return None
+    return None
+
+# Concurrent LLM calls per API key (rate limits are per key/org): bursts queue
+# here instead of fanning out into 429s and retry storms. 0 disables the bound.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "10"))
+# Weak values: a key's semaphore lives only while some call holds a reference
+_llm_semaphores: weakref.WeakValueDictionary[str, asyncio.Semaphore] = weakref.WeakValueDictionary()
+
+def _llm_slot(api_key: str | None) -> asyncio.Semaphore | nullcontext:
+    if LLM_MAX_CONCURRENCY <= 0:
+        return nullcontext()
+    key = _api_key_hash(api_key)
+    sem = _llm_semaphores.get(key)
+    if sem is None:
+        sem = _llm_semaphores[key] = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return sem
+
+async def _run_with_retries(run_coro_factory, timeout: float, *, api_key: str | None = None, attempts: int = 3) -> Any:
     """Run an async LLM call with bounded retries and exponential backoff.
 
+    Only transient errors (timeouts, connection errors, 429/5xx) are retried;
+    a server-provided Retry-After is honored (capped) instead of the backoff.
+    Each attempt holds one of the key's LLM_MAX_CONCURRENCY slots (not while
+    backing off); queueing for a slot does not count against the timeout.
+
     Args:
         run_coro_factory: zero-arg callable returning the coroutine to await (fresh per attempt)
         timeout: per-attempt timeout in seconds
+        api_key: per-request key the call is made with (None -> server key)
         attempts: total number of attempts
     """
+    slot = _llm_slot(api_key)
     backoff = 0.5
-    last_exc: Exception | None = None
     for i in range(1, attempts + 1):
         try:
-            return await asyncio.wait_for(run_coro_factory(), timeout=timeout)
-        except Exception as e:  # broad: includes timeouts/transient API errors
-            last_exc = e
-            if i >= attempts:
-                break
-            # jittered exponential backoff
-            await asyncio.sleep(backoff + (0.1 * i))
-            backoff *= 2
-    # Exhausted attempts
-    assert last_exc is not None
-    raise last_exc
+            async with slot:
+                return await asyncio.wait_for(run_coro_factory(), timeout=timeout)
+        except Exception as e:
+            if i >= attempts or not _is_retryable(e):
+                raise
+            delay = _retry_after(e)
+            if delay is None:
+                # jittered exponential backoff
+                delay = backoff + (0.1 * i)
+                backoff *= 2
+            await asyncio.sleep(min(delay, _MAX_RETRY_AFTER_SECONDS))
+
+# --- Cache keys and user prompts (shared with the batch pipeline) ---
+# Inputs above this size are hashed off the event loop
+_DIGEST_OFFLOAD_BYTES = 1024 * 1024
+
+def _digest(data: bytes) -> str:
+    # BLAKE3 is SIMD-accelerated and several times faster than SHA-256 for cache fingerprints
+    return blake3.blake3(data).hexdigest()
+
+async def _adigest(data: bytes) -> str:
+    if len(data) > _DIGEST_OFFLOAD_BYTES:
+        return await asyncio.to_thread(_digest, data)
+    return _digest(data)
+
+def vacancy_cache_key(vacancy_text: str, provider_norm: str, model_norm: str) -> str:
+    # Cache key includes inputs + model/provider + version for correctness across config changes.
+    # Leading/trailing whitespace is dropped so a re-pasted vacancy still hits.
+    base = _digest(vacancy_text.strip().encode("utf-8"))
+    enh_flag = "enh1"  # always use enhanced prompts
+    return f"vacancy:{AGENT_VERSION}:{enh_flag}:{provider_norm}:{model_norm}:{base}"
+
+def score_payload(cv_json: str, job_json: str) -> bytes:
+    # One canonical serialization, reused for the cache key and the user prompt.
+    # model_dump_json() emits fields in declaration order (the same bytes as
+    # orjson over model_dump()), so the payload is deterministic without sorting
+    # keys and the already-validated models are never dumped back to dicts.
+    return f'{{"cv":{cv_json},"job":{job_json}}}'.encode()
+
+def score_cache_key(payload: bytes, provider_norm: str, model_norm: str) -> str:
+    return f"score:{AGENT_VERSION}:{provider_norm}:{model_norm}:" + _digest(payload)
+
+# User messages carry only the data; the task instructions live in the system prompt
+def job_user_prompt(vacancy_text: str) -> str:
+    return f"Vacancy text:\n\n{vacancy_text}"
+
+def score_system_prompt(job_json: str) -> str:
+    return enhanced_prompts.get_scoring_prompt(job_json)
+
+def score_user_prompt(payload: bytes) -> str:
+    return f"CV analysis (cv) and job requirements (job) JSON: {payload.decode()}"
+
+async def cached_result(key: str):
+    # Response cache, then a Batch API result for the same key (batch.py); a
+    # batch hit is promoted so the next lookup stays on the interactive cache
+    cached = await shared_cache.get(key)
+    if cached is None:
+        cached = await batch_cache.get(key)
+        if cached is not None:
+            await shared_cache.set(key, cached)
+    return cached
 
 # --- Core Functions ---
+# Long vacancies are analyzed on their own so a batch stays well inside the context window
+_BATCH_MAX_TEXT_CHARS = 8000
+
+def job_batch_user_prompt(vacancy_texts: list[str]) -> str:
+    numbered = "\n\n".join(f"{i}. {text}" for i, text in enumerate(vacancy_texts, start=1))
+    return (
+        f"Return exactly {len(vacancy_texts)} job requirement objects, one per vacancy, "
+        f"in the same order.\n\nVacancy texts:\n\n{numbered}"
+    )
+
+async def _run_job_agent(provider_norm: str, model_norm: str, api_key: str | None, system_prompt: str, vacancy_text: str) -> JobRequirements:
+    agent = _get_agent('job', system_prompt)
+    llm = _get_model(provider_norm, model_norm, api_key)
+    logfire.info("analyze_job_vacancy calling LLM", model_id=f"{provider_norm}:{model_norm}", task="job")
+    result = await _run_with_retries(
+        lambda: agent.run(job_user_prompt(vacancy_text), model=llm),
+        timeout=60,
+        api_key=api_key,
+    )
+    return result.output
+
+async def _run_job_batch(group: tuple[str | None, str, str, str], vacancy_texts: list[str]) -> list[JobRequirements]:
+    """Batcher callback: analyze several vacancies with one LLM call returning a list."""
+    api_key, provider_norm, model_norm, system_prompt = group
+    if len(vacancy_texts) == 1:
+        return [await _run_job_agent(provider_norm, model_norm, api_key, system_prompt, vacancy_texts[0])]
+    settings = {'max_tokens': min(16384, task_model_settings('job')['max_tokens'] * len(vacancy_texts))}
+    agent = _get_agent('job_batch', system_prompt)
+    llm = _get_model(provider_norm, model_norm, api_key)
+    logfire.info(
+        "analyze_job_vacancy calling LLM",
+        model_id=f"{provider_norm}:{model_norm}", task="job", batch_size=len(vacancy_texts),
+    )
+    result = await _run_with_retries(
+        lambda: agent.run(job_batch_user_prompt(vacancy_texts), model=llm, model_settings=settings),
+        timeout=90,
+        api_key=api_key,
+    )
+    if len(result.output) != len(vacancy_texts):
+        # Misaligned answer: fall back to one call per vacancy rather than guessing the mapping
+        logfire.warn(
+            "batched job analysis returned wrong item count",
+            expected=len(vacancy_texts), got=len(result.output),
+        )
+        return list(await asyncio.gather(*(
+            _run_job_agent(provider_norm, model_norm, api_key, system_prompt, text) for text in vacancy_texts
+        )))
+    return list(result.output)
+
+_job_batcher = batcher.Batcher(_run_job_batch, max_batch=batcher.BATCH_MAX_SIZE, max_wait_ms=batcher.BATCH_MAX_WAIT_MS)
+
 async def analyze_job_vacancy(vacancy_text: str, api_key: str | None = None, provider: str | None = None, model: str | None = None) -> JobRequirements:
     """
     Extract requirements from job vacancy text with performance monitoring
@@ -129,46 +400,53 @@ async def analyze_job_vacancy(vacancy_text: str, api_key: str | None = None, pro
     start_time = time.time()
     
     try:
-        # Cache key includes inputs + model/provider + version for correctness across config changes
-        base = hashlib.sha256(vacancy_text.encode("utf-8")).hexdigest()
         provider_norm = (provider or 'openai').lower()
         model_norm = (model or '').strip() or 'gpt-4o'
-        enh_flag = "enh1"  # always use enhanced prompts
-        key = f"vacancy:{AGENT_VERSION}:{enh_flag}:{provider_norm}:{model_norm}:{base}"
-        cached = await shared_cache.get(key)
+        key = vacancy_cache_key(vacancy_text, provider_norm, model_norm)
+        cached = await cached_result(key)
         if cached is not None:
             duration = time.time() - start_time
-            logfire.info("analyze_job_vacancy cache hit", extra={
-                "key": key, "provider": provider_norm, "model": model_norm, 
-                "duration_ms": round(duration * 1000, 2)
-            })
-            return JobRequirements(**cached)
+            logfire.info(
+                "analyze_job_vacancy cache hit",
+                key=key, provider=provider_norm, model=model_norm,
+                duration_ms=round(duration * 1000, 2),
+            )
+            return cached
 
         async def _compute():
-            async with _ApiKeyContext(api_key):
-                model_id = _model_string((provider or 'openai').lower(), (model or '').strip() or 'gpt-4o')
-                # Always use enhanced system prompt for job analysis
-                system_prompt = enhanced_prompts.get_job_analysis_prompt(vacancy_text)
-                settings = _DEFAULT_MODEL_SETTINGS
-                agent = Agent(model_id, output_type=JobRequirements, system_prompt=system_prompt, model_settings=settings)
-                logfire.info("analyze_job_vacancy calling LLM", extra={"model_id": model_id, "task": "job"})
-                result = await _run_with_retries(
-                    lambda: agent.run(
-                        f"Extract the job requirements and any other key information from the vacancy text: {vacancy_text}"
-                    ),
-                    timeout=60,
-                )
-            # store a plain dict in cache
-            await shared_cache.set(key, result.output.model_dump())
+            # Near-duplicate lookup (opt-in): reuse results for trivially edited reposts
+            embedding = None
+            semantic_ns = f"vacancy:{AGENT_VERSION}:{provider_norm}:{model_norm}:{semantic_cache.EMBEDDING_ID}"
+            if semantic_cache.SEMANTIC_CACHE_ENABLED:
+                # Same per-key bound as the LLM calls: embeddings share the key's rate limit
+                embedding = await semantic_cache.embed(get_openai_client(api_key), vacancy_text, slot=_llm_slot(api_key))
+                if embedding is not None:
+                    similar = await semantic_cache.semantic_cache.lookup(semantic_ns, embedding)
+                    if similar is not None:
+                        await shared_cache.set(key, similar)
+                        return similar
+
+            # Always use enhanced system prompt for job analysis
+            system_prompt = enhanced_prompts.get_job_analysis_prompt(vacancy_text)
+            if batcher.BATCH_ENABLED and len(vacancy_text) <= _BATCH_MAX_TEXT_CHARS:
+                # Coalesce with concurrent vacancies sharing key/model/prompt into one LLM call
+                output = await _job_batcher.submit((api_key, provider_norm, model_norm, system_prompt), vacancy_text)
+            else:
+                output = await _run_job_agent(provider_norm, model_norm, api_key, system_prompt, vacancy_text)
+            # cache the validated model itself: hits skip re-validation
+            await shared_cache.set(key, output)
+            if embedding is not None:
+                await semantic_cache.semantic_cache.add(semantic_ns, key, embedding, output)
             duration = time.time() - start_time
-            logfire.info("analyze_job_vacancy completed", extra={
-                "provider": provider_norm, "model": model_norm,
-                "duration_ms": round(duration * 1000, 2),
-                "text_length": len(vacancy_text)
-            })
-            return result.output
+            logfire.info(
+                "analyze_job_vacancy completed",
+                provider=provider_norm, model=model_norm,
+                duration_ms=round(duration * 1000, 2),
+                text_length=len(vacancy_text),
+            )
+            return output
 
-        return await _compute()
+        return await shared_cache.single_flight(key, _compute)
     except ValidationError as e:
         logfire.error(f"Validation error in analyze_job_vacancy: {e}")
         if hasattr(e, 'json'):
@@ -178,46 +456,64 @@ async def analyze_job_vacancy(vacancy_text: str, api_key: str | None = None, pro
         logfire.error(f"Unexpected error in analyze_job_vacancy: {e}")
         raise
 
-async def analyze_cv(pdf_path: Path, api_key: str | None = None, provider: str | None = None, model: str | None = None, job_context: str | None = None) -> CVAnalysis:
+# Bumped when the CV input pipeline changes (txt1: local text extraction pre-pass)
+_CV_INPUT_FLAG = "txt1"
+
+async def _cv_content(pdf_bytes: bytes) -> list[Any]:
+    """
+    CV as LLM input: extracted text for text-native PDFs, raw PDF bytes for scans.
+
+    Text is far cheaper than the document/vision path; the choice depends only on
+    the bytes, so one cache key per PDF stays unambiguous.
+    """
+    text = await pdf_extract.ausable_text(pdf_bytes)
+    if text is not None:
+        return [f"CV text:\n\n{text}"]
+    return [BinaryContent(data=pdf_bytes, media_type='application/pdf')]
+
+async def analyze_cv(pdf_bytes: bytes, api_key: str | None = None, provider: str | None = None, model: str | None = None, job_context: str | None = None) -> CVAnalysis:
     """
     Analyze CV and extract key information
     """
     try:
-        data = pdf_path.read_bytes()
         provider_norm = (provider or 'openai').lower()
         model_norm = (model or '').strip() or 'gpt-4o'
-        # Include job context in cache key for context-aware analysis
-        context_hash = hashlib.sha256((job_context or "").encode("utf-8")).hexdigest()[:8]
-        key = "cv:{}:{}:{}:{}:".format(
+        # job_context only selects the domain prompt, so key on the detected
+        # category: the same CV checked against another vacancy of the same
+        # kind is a cache hit
+        category = enhanced_prompts.detect_job_category(job_context or "")
+        key = "cv:{}:{}:{}:{}:{}:".format(
             AGENT_VERSION,
+            _CV_INPUT_FLAG,
             provider_norm,
             model_norm,
-            context_hash
-        ) + hashlib.sha256(data).hexdigest()
+            category.value
+        ) + await _adigest(pdf_bytes)
         cached = await shared_cache.get(key)
         if cached is not None:
-            logfire.info("analyze_cv cache hit", extra={"key": key, "provider": provider_norm, "model": model_norm})
-            return CVAnalysis(**cached)
+            logfire.info("analyze_cv cache hit", key=key, provider=provider_norm, model=model_norm)
+            return cached
 
         async def _compute():
-            async with _ApiKeyContext(api_key):
-                model_id = _model_string((provider or 'openai').lower(), (model or '').strip() or 'gpt-4o')
-                # Always use enhanced CV analysis prompt (with optional job_context)
-                system_prompt = enhanced_prompts.get_cv_analysis_prompt(job_context)
-                settings = _DEFAULT_MODEL_SETTINGS
-                agent = Agent(model_id, output_type=CVAnalysis, system_prompt=system_prompt, model_settings=settings)
-                logfire.info("analyze_cv calling LLM", extra={"model_id": model_id, "task": "cv"})
-                result = await _run_with_retries(
-                    lambda: agent.run([
-                        "Analyze the CV and provide a bulletpoint summary of strengths, weaknesses, and improvement recommendations.",
-                        BinaryContent(data=data, media_type='application/pdf'),
-                    ]),
-                    timeout=90,
-                )
-            await shared_cache.set(key, result.output.model_dump())
+            model_id = f"{provider_norm}:{model_norm}"
+            # Always use enhanced CV analysis prompt (with optional job_context)
+            system_prompt = enhanced_prompts.get_cv_analysis_prompt(job_context) if job_context else _DEFAULT_CV_PROMPT
+            agent = _get_agent('cv', system_prompt)
+            llm = _get_model(provider_norm, model_norm, api_key)
+            cv_content = await _cv_content(pdf_bytes)
+            logfire.info(
+                "analyze_cv calling LLM",
+                model_id=model_id, task="cv", input="pdf" if isinstance(cv_content[0], BinaryContent) else "text",
+            )
+            result = await _run_with_retries(
+                lambda: agent.run(cv_content, model=llm),
+                timeout=90,
+                api_key=api_key,
+            )
+            await shared_cache.set(key, result.output)
             return result.output
 
-        return await _compute()
+        return await shared_cache.single_flight(key, _compute)
     except ValidationError as e:
         logfire.error(f"Validation error in analyze_cv: {e}")
         if hasattr(e, 'json'):
@@ -227,48 +523,121 @@ async def analyze_cv(pdf_path: Path, api_key: str | None = None, provider: str |
         logfire.error(f"Unexpected error in analyze_cv: {e}")
         raise
 
+# Scoring is a constrained numeric judgment: unless the caller picks a model, use a
+# small model and take the per-field median of a few parallel votes
+SCORE_DEFAULT_MODEL = "gpt-4o-mini"
+SCORE_VOTES = 3
+_SCORE_VOTE_SETTINGS = {'temperature': 0.5}
+_SCORE_FIELDS = tuple(name for name in MatchingScore.model_fields if name.endswith('_score'))
+
+def score_model(model: str | None) -> tuple[str, int]:
+    """Resolve the scoring model and number of votes (explicit model -> single call)."""
+    if model and model.strip():
+        return model.strip(), 1
+    return SCORE_DEFAULT_MODEL, SCORE_VOTES
+
+def _median_score(scores: list[MatchingScore]) -> MatchingScore:
+    """Per-field median of numeric scores; explanations/lists come from the median-overall vote."""
+    overall = statistics.median_low(s.overall_match_score for s in scores)
+    base = next(s for s in scores if s.overall_match_score == overall)
+    data = base.model_dump()
+    for name in _SCORE_FIELDS:
+        data[name] = statistics.median_low(getattr(s, name) for s in scores)
+    return MatchingScore(**data)
+
+async def _run_score_agent(provider_norm: str, model_norm: str, votes: int, api_key: str | None, system_prompt: str, payload: bytes) -> MatchingScore:
+    agent = _get_agent('score', system_prompt)
+    llm = _get_model(provider_norm, model_norm, api_key)
+    settings = _SCORE_VOTE_SETTINGS if votes > 1 else None
+    logfire.info("score_cv_match calling LLM", model_id=f"{provider_norm}:{model_norm}", task="score", votes=votes)
+    results = await asyncio.gather(*(
+        _run_with_retries(
+            lambda: agent.run(score_user_prompt(payload), model=llm, model_settings=settings),
+            timeout=60,
+            api_key=api_key,
+        )
+        for _ in range(votes)
+    ))
+    return results[0].output if votes == 1 else _median_score([r.output for r in results])
+
+# Larger CV/job pairs are scored on their own; batches group pairs by payload-size
+# bucket (bit length) so one long pair does not dominate a batch of short ones
+_SCORE_BATCH_MAX_PAYLOAD_BYTES = 16000
+
+def score_batch_user_prompt(payloads: list[bytes]) -> str:
+    numbered = "\n\n".join(f"{i}. {payload.decode()}" for i, payload in enumerate(payloads, start=1))
+    return (
+        f"Return exactly {len(payloads)} match score objects, one per pair, in the same order.\n\n"
+        f"CV analysis (cv) and job requirements (job) JSON pairs:\n\n{numbered}"
+    )
+
+async def _run_score_batch(group: tuple[str | None, str, str, int, str, int], payloads: list[bytes]) -> list[MatchingScore]:
+    """Batcher callback: score several CV/job pairs with one LLM call (per vote) returning a list."""
+    api_key, provider_norm, model_norm, votes, system_prompt, _bucket = group
+    if len(payloads) == 1:
+        return [await _run_score_agent(provider_norm, model_norm, votes, api_key, system_prompt, payloads[0])]
+    settings = {'max_tokens': min(16384, task_model_settings('score')['max_tokens'] * len(payloads))}
+    if votes > 1:
+        settings.update(_SCORE_VOTE_SETTINGS)
+    agent = _get_agent('score_batch', system_prompt)
+    llm = _get_model(provider_norm, model_norm, api_key)
+    prompt = score_batch_user_prompt(payloads)
+    logfire.info(
+        "score_cv_match calling LLM",
+        model_id=f"{provider_norm}:{model_norm}", task="score", votes=votes, batch_size=len(payloads),
+    )
+    results = await asyncio.gather(*(
+        _run_with_retries(
+            lambda: agent.run(prompt, model=llm, model_settings=settings),
+            timeout=90,
+            api_key=api_key,
+        )
+        for _ in range(votes)
+    ))
+    if any(len(r.output) != len(payloads) for r in results):
+        # Misaligned answer: fall back to one call per pair rather than guessing the mapping
+        logfire.warn(
+            "batched scoring returned wrong item count",
+            expected=len(payloads), got=[len(r.output) for r in results],
+        )
+        return list(await asyncio.gather(*(
+            _run_score_agent(provider_norm, model_norm, votes, api_key, system_prompt, payload) for payload in payloads
+        )))
+    if votes == 1:
+        return list(results[0].output)
+    return [_median_score([r.output[i] for r in results]) for i in range(len(payloads))]
+
+_score_batcher = batcher.Batcher(_run_score_batch, max_batch=batcher.BATCH_MAX_SIZE, max_wait_ms=batcher.BATCH_MAX_WAIT_MS)
+
 async def score_cv_match(cv_analysis: CVAnalysis, job_requirements: JobRequirements, api_key: str | None = None, provider: str | None = None, model: str | None = None) -> MatchingScore:
     """
     Score how well the CV matches the job requirements
     """
     try:
-        payload = json.dumps(
-            {
-                "cv": cv_analysis.model_dump(),
-                "job": job_requirements.model_dump(),
-            },
-            sort_keys=True,
-        )
         provider_norm = (provider or 'openai').lower()
-        model_norm = (model or '').strip() or 'gpt-4o'
-        key = f"score:{AGENT_VERSION}:{provider_norm}:{model_norm}:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
-        cached = await shared_cache.get(key)
+        model_norm, votes = score_model(model)
+        job_json = job_requirements.model_dump_json()
+        payload = score_payload(cv_analysis.model_dump_json(), job_json)
+        # The aggregated vote is cached, so the multi-call cost is paid once per (cv, job) pair
+        key = score_cache_key(payload, provider_norm, model_norm if votes == 1 else f"{model_norm}x{votes}")
+        cached = await cached_result(key)
         if cached is not None:
-            logfire.info("score_cv_match cache hit", extra={"key": key, "provider": provider_norm, "model": model_norm})
-            return MatchingScore(**cached)
+            logfire.info("score_cv_match cache hit", key=key, provider=provider_norm, model=model_norm)
+            return cached
 
         async def _compute():
-            async with _ApiKeyContext(api_key):
-                model_id = _model_string((provider or 'openai').lower(), (model or '').strip() or 'gpt-4o')
-                # Always use enhanced scoring prompt (derive category from job content)
-                job_text_for_prompt = json.dumps(job_requirements.model_dump(), sort_keys=True)
-                system_prompt = enhanced_prompts.get_scoring_prompt(job_text_for_prompt)
-                settings = _DEFAULT_MODEL_SETTINGS
-                agent = Agent(model_id, output_type=MatchingScore, system_prompt=system_prompt, model_settings=settings)
-                logfire.info("score_cv_match calling LLM", extra={"model_id": model_id, "task": "score"})
-                result = await _run_with_retries(
-                    lambda: agent.run(
-                        (
-                            f"CV Analysis JSON: {json.dumps(cv_analysis.model_dump(), sort_keys=True)}\n\n"
-                            f"Job Requirements JSON: {json.dumps(job_requirements.model_dump(), sort_keys=True)}"
-                        )
-                    ),
-                    timeout=60,
-                )
-            await shared_cache.set(key, result.output.model_dump())
-            return result.output
+            # Always use enhanced scoring prompt (derive category from job content)
+            system_prompt = score_system_prompt(job_json)
+            if batcher.BATCH_ENABLED and len(payload) <= _SCORE_BATCH_MAX_PAYLOAD_BYTES:
+                # Coalesce with concurrent pairs of a similar size sharing key/model/prompt
+                group = (api_key, provider_norm, model_norm, votes, system_prompt, len(payload).bit_length())
+                output = await _score_batcher.submit(group, payload)
+            else:
+                output = await _run_score_agent(provider_norm, model_norm, votes, api_key, system_prompt, payload)
+            await shared_cache.set(key, output)
+            return output
 
-        return await _compute()
+        return await shared_cache.single_flight(key, _compute)
     except ValidationError as e:
         logfire.error(f"Validation error in score_cv_match: {e}")
         if hasattr(e, 'json'):
@@ -276,4 +645,101 @@ async def score_cv_match(cv_analysis: CVAnalysis, job_requirements: JobRequireme
         raise
     except Exception as e:
         logfire.error(f"Unexpected error in score_cv_match: {e}")
-        raise
\ No newline at end of file
+        raise
+
+async def analyze_cv_and_score(pdf_bytes: bytes, job_requirements: JobRequirements, api_key: str | None = None, provider: str | None = None, model: str | None = None) -> tuple[CVAnalysis, MatchingScore]:
+    """
+    Analyze the CV and score it against already-extracted job requirements in one LLM call.
+
+    Saves the separate scoring round-trip (and its repeated system prompt) of
+    analyze_cv -> score_cv_match when the job requirements are already known.
+    """
+    try:
+        provider_norm = (provider or 'openai').lower()
+        model_norm = (model or '').strip() or 'gpt-4o'
+        job_json = job_requirements.model_dump_json()
+        key = "cvscore:{}:{}:{}:{}:{}:".format(
+            AGENT_VERSION,
+            _CV_INPUT_FLAG,
+            provider_norm,
+            model_norm,
+            _digest(job_json.encode("utf-8"))[:16]
+        ) + await _adigest(pdf_bytes)
+        cached = await shared_cache.get(key)
+        if cached is not None:
+            logfire.info("analyze_cv_and_score cache hit", key=key, provider=provider_norm, model=model_norm)
+            return cached
+
+        async def _compute():
+            model_id = f"{provider_norm}:{model_norm}"
+            system_prompt = enhanced_prompts.get_cv_and_scoring_prompt(job_json)
+            agent = _get_agent('cvscore', system_prompt)
+            llm = _get_model(provider_norm, model_norm, api_key)
+            cv_content = await _cv_content(pdf_bytes)
+            logfire.info(
+                "analyze_cv_and_score calling LLM",
+                model_id=model_id, task="cvscore", input="pdf" if isinstance(cv_content[0], BinaryContent) else "text",
+            )
+            result = await _run_with_retries(
+                lambda: agent.run([
+                    f"Job Requirements JSON: {job_json}",
+                    *cv_content,
+                ], model=llm),
+                timeout=90,
+                api_key=api_key,
+            )
+            split = result.output.split()
+            await shared_cache.set(key, split)
+            return split
+
+        return await shared_cache.single_flight(key, _compute)
+    except ValidationError as e:
+        logfire.error(f"Validation error in analyze_cv_and_score: {e}")
+        if hasattr(e, 'json'):
+            logfire.error(f"Raw LLM output: {getattr(e, 'json', lambda: None)()}")
+        raise
+    except Exception as e:
+        logfire.error(f"Unexpected error in analyze_cv_and_score: {e}")
+        raise
+
+async def analyze_and_score(vacancy_text: str, pdf_bytes: bytes, api_key: str | None = None, provider: str | None = None, model: str | None = None) -> tuple[JobRequirements, CVAnalysis, MatchingScore]:
+    """
+    Analyze the vacancy and the CV concurrently, then score the match.
+
+    The job and CV analyses are independent LLM round-trips, so they are
+    dispatched together and only scoring waits on both results. If one fails,
+    the other is cancelled rather than left running (and billed) for nothing.
+    """
+    try:
+        async with asyncio.TaskGroup() as tg:
+            job_task = tg.create_task(analyze_job_vacancy(vacancy_text, api_key=api_key, provider=provider, model=model))
+            cv_task = tg.create_task(analyze_cv(pdf_bytes, api_key=api_key, provider=provider, model=model, job_context=vacancy_text))
+    except ExceptionGroup as eg:
+        # Surface the original error, as gather() did: callers handle its type and message
+        raise eg.exceptions[0]
+    job_requirements, cv_analysis = job_task.result(), cv_task.result()
+    match_score = await score_cv_match(cv_analysis, job_requirements, api_key=api_key, provider=provider, model=model)
+    return job_requirements, cv_analysis, match_score
+
+def prewarm_agents() -> None:
+    """
+    Build the default-category agents up front so the first request per task
+    does not pay for Agent/output-schema construction.
+    - only prompts that do not depend on request data (DEFAULT category)
+    - agents are model-less, so no API key or network access is needed
+    """
+    job_prompt = enhanced_prompts.get_job_analysis_prompt("")
+    score_prompt = enhanced_prompts.get_scoring_prompt("")
+    for task, system_prompt in (
+        ('job', job_prompt),
+        ('job_batch', job_prompt),
+        ('cv', _DEFAULT_CV_PROMPT),
+        ('score', score_prompt),
+        ('score_batch', score_prompt),
+        ('cvscore', enhanced_prompts.get_cv_and_scoring_prompt("")),
+    ):
+        _get_agent(task, system_prompt)
+
+# Opt out with PREWARM=0 (e.g. in tests that swap in fake agents)
+if os.getenv("PREWARM", "1") == "1":
+    prewarm_agents()
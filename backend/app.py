@@ -1,28 +1,63 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, status, Header, Request
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi import FastAPI, UploadFile, HTTPException, status, Header, Request, Depends
+from fastapi.responses import HTMLResponse, FileResponse, ORJSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.formparsers import MultiPartException, MultiPartParser
 from pydantic import BaseModel
 from pathlib import Path
 from dotenv import load_dotenv
-import shutil
 import os
 import logfire
-from uuid import uuid4
+import asyncio
 import inspect
+import json
+import re
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import NamedTuple
 
 from models import JobRequirements, CVAnalysis, MatchingScore
 import agents
+import batch
+import pdf_extract
+import semantic_cache
+from cache_utils import batch_cache, shared_cache
 
 load_dotenv()
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: restore the vacancy cache snapshot (CACHE_SNAPSHOT_PATH) and load
+    # the local embedding model, so neither cost lands on the first request
+    loaded = agents.load_cache_snapshot()
+    if loaded:
+        logfire.info("cache snapshot loaded", entries=loaded)
+    await asyncio.to_thread(semantic_cache.preload)
+    pdf_extract.start_pool()
+    # Expired entries that are never read again would otherwise hold their slot until LRU eviction
+    sweepers = [asyncio.create_task(shared_cache.sweep()), asyncio.create_task(batch_cache.sweep())]
+    yield
+    # Shutdown: persist vacancy analyses, then close the PDF pool and shared HTTP pool
+    for sweeper in sweepers:
+        sweeper.cancel()
+    pdf_extract.shutdown_pool()
+    try:
+        saved = agents.save_cache_snapshot()
+        if saved:
+            logfire.info("cache snapshot saved", entries=saved)
+    except OSError as e:
+        logfire.warn(f"Could not write cache snapshot: {e}")
+    await agents.aclose_http_client()
+
+# orjson for every JSON response. The LLM endpoints return their Response
+# themselves (model_dump_json() for plain models, ORJSONResponse for composed
+# dicts): a returned dict would first go through jsonable_encoder, which walks
+# the already JSON-ready model_dump() output a second time.
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # Configuration
-UPLOAD_DIR = Path("uploaded_cvs")
-UPLOAD_DIR.mkdir(exist_ok=True)  # Create directory if it doesn't exist
-
-# Max upload size (in MB). Defaults to 10MB. Applies to Content-Length and verified file size on disk.
+# Max upload size (in MB). Defaults to 10MB. Applies to Content-Length and the bytes actually read.
 try:
     MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "10"))
     if MAX_UPLOAD_MB <= 0:
@@ -35,9 +70,8 @@ MAX_UPLOAD_BYTES = MAX_UPLOAD_MB * 1024 * 1024
 REQUIRE_USER_API_KEY = os.getenv("REQUIRE_USER_API_KEY", "true").lower() in {"1", "true", "yes"}
 
 # Data retention policy: do NOT retain uploaded CVs on the server.
-# Files are processed and deleted immediately after analysis.
+# Uploads are read into memory, analyzed, and never written to disk.
 # This is hardcoded for Chrome Web Store compliance (no server storage of user CVs).
-RETAIN_UPLOADED_CVS = False
 
 # CORS configuration
 # Prefer explicit ALLOWED_ORIGINS; otherwise build safe defaults.
@@ -61,25 +95,203 @@ app.add_middleware(
     allow_origins=ALLOWED_ORIGINS,
     allow_credentials=False,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    # Let browsers reuse a preflight for a day (Chrome caps this at 2h) instead of
+    # Starlette's 10 min default; the extension preflights every keyed request
+    max_age=86400,
 )
 
-# Serve static assets (e.g., policy pages) from ./static at /static
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Serve static assets (e.g., policy pages) from ./static at /static.
+# Resolved once next to this file: independent of the working directory, and
+# the policy pages join onto it without re-deriving the path per request.
+STATIC_DIR = Path(__file__).resolve().parent / "static"
+app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+
+# Client-supplied IDs are echoed and attached to every span, so only short
+# token-like values are trusted; anything else gets a fresh ID
+_REQUEST_ID_RE = re.compile(rb"[A-Za-z0-9_-]{1,128}")
+
+# Correlation ID middleware for observability; adds X-Request-ID.
+# Plain ASGI rather than @app.middleware("http"): BaseHTTPMiddleware wraps every
+# request/response in extra stream and task plumbing just to read one header.
+class RequestIdMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        # ASGI header names are lowercase; first match wins, as with headers.get()
+        raw_id = next((value for name, value in scope["headers"] if name == b"x-request-id"), b"")
+        if not _REQUEST_ID_RE.fullmatch(raw_id):
+            # 16 random bytes as hex: same entropy as uuid4 without building a UUID object
+            raw_id = os.urandom(16).hex().encode("ascii")
+        request_id = raw_id.decode("ascii")
+        # attach to request state for handlers (request.state reads scope["state"])
+        scope.setdefault("state", {})["request_id"] = request_id
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), (b"x-request-id", raw_id)]
+            await send(message)
+
+        # Baggage lives in the (contextvar-based) OpenTelemetry context: every
+        # logfire log/span of this request, including those in agents, gets a
+        # request_id attribute without passing it around
+        with logfire.set_baggage(request_id=request_id):
+            await self.app(scope, receive, send_with_request_id)
+
+app.add_middleware(RequestIdMiddleware)
+
+class LLMHeaders(NamedTuple):
+    api_key: str | None
+    provider: str
+    model: str | None
+
+@lru_cache(maxsize=8)
+def _normalize_provider(provider: str | None) -> str:
+    # A handful of distinct header values in practice; bounded so junk values cannot grow it
+    return (provider or "openai").lower()
+
+async def require_llm_headers(
+    x_openai_key: str | None = Header(default=None, alias="X-OpenAI-Key"),
+    x_llm_provider: str | None = Header(default=None, alias="X-LLM-Provider"),
+    x_llm_model: str | None = Header(default=None, alias="X-LLM-Model"),
+) -> LLMHeaders:
+    """Shared key/provider guard for the LLM endpoints (async so it runs inline, not in the threadpool)."""
+    if REQUIRE_USER_API_KEY and not x_openai_key:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="X-OpenAI-Key is required")
+    provider = _normalize_provider(x_llm_provider)
+    if provider != "openai":
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"LLM provider '{provider}' not supported yet")
+    return LLMHeaders(x_openai_key, provider, x_llm_model)
+
+# Upload endpoints parse multipart themselves (instead of File()/Form() params)
+# so the header guard and Content-Length check run before the body is read;
+# FastAPI would otherwise parse the whole form before resolving dependencies.
+def _multipart_openapi(required: list[str], properties: dict) -> dict:
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {
+        "schema": {"type": "object", "required": required, "properties": properties},
+    }}}}
+
+_PDF_FILE_FIELD = {"type": "string", "format": "binary"}
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File too large. Max {MAX_UPLOAD_MB}MB",
+    )
+
+def _limited_request(request: Request) -> Request:
+    """
+    The request with its body capped at MAX_UPLOAD_BYTES, for parsing multipart forms.
+
+    A declared Content-Length over the limit is rejected before anything is read;
+    bodies without one (chunked uploads) fail with 413 at the first chunk past the
+    limit instead of being spooled in full before the size check.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length is not None:
+        try:
+            if int(content_length) > MAX_UPLOAD_BYTES:
+                raise _too_large()
+        except ValueError:
+            # ignore malformed header and rely on the streamed byte count
+            pass
 
-# Correlation ID middleware for observability; adds X-Request-ID
-@app.middleware("http")
-async def add_request_id(request: Request, call_next):
-    request_id = request.headers.get("X-Request-ID") or str(uuid4())
-    # attach to request state for downstream logs
-    request.state.request_id = request_id
+    receive = request.receive
+    received = 0
+
+    async def limited_receive():
+        nonlocal received
+        message = await receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            if received > MAX_UPLOAD_BYTES:
+                raise _too_large()
+        return message
+
+    return Request(request.scope, limited_receive)
+
+class _UploadParser(MultiPartParser):
+    """
+    Multipart parser for the CV upload endpoints only (see _upload_form).
+
+    Starlette spools files over 1MB to a temp file, so typical CVs were written
+    to disk and read straight back. Files up to the upload limit stay in memory
+    instead: no temp-file syscalls and CV bytes never touch disk, at a RAM cost
+    of up to MAX_UPLOAD_MB per concurrent upload.
+    """
+    spool_max_size = max(MultiPartParser.spool_max_size, MAX_UPLOAD_BYTES)
+
+if not hasattr(MultiPartParser, "spool_max_size"):
+    # Renamed upstream: the override above would silently do nothing
+    logfire.warn("starlette MultiPartParser has no spool_max_size; uploads over 1MB may spool to disk")
+
+@asynccontextmanager
+async def _upload_form(request: Request):
+    """The request's form parsed with _UploadParser and capped by _limited_request; closed on exit."""
+    limited = _limited_request(request)
+    content_type = request.headers.get("content-type", "").split(";", 1)[0].strip().lower()
+    if content_type != "multipart/form-data":
+        # No file part possible (the handlers answer 422); parse as Starlette would
+        async with limited.form(max_files=1) as form:
+            yield form
+        return
+    try:
+        form = await _UploadParser(limited.headers, limited.stream(), max_files=1).parse()
+    except MultiPartException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.message)
     try:
-        response = await call_next(request)
+        yield form
     finally:
-        # ensure header on response even if exception handlers run
-        pass
-    response.headers["X-Request-ID"] = request_id
-    return response
+        await form.close()
+
+def _form_file(form) -> UploadFile:
+    file = form.get("file")
+    if file is None or isinstance(file, str):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Field 'file' (PDF) is required")
+    return file
+
+def _form_text(form, name: str) -> str | None:
+    value = form.get(name)
+    return value if isinstance(value, str) else None
+
+_ALLOWED_UPLOAD_EXTENSIONS = frozenset({".pdf"})
+
+async def _read_upload(file: UploadFile) -> bytes:
+    """Validate an uploaded CV (size + PDF extension) and return its bytes; nothing touches disk."""
+    # Ensure the file is a PDF (a missing filename counts as not a PDF)
+    if os.path.splitext(file.filename or "")[1].lower() not in _ALLOWED_UPLOAD_EXTENSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only PDF files are accepted"
+        )
+
+    # Read at most one byte past the limit to detect oversized uploads
+    contents = await file.read(MAX_UPLOAD_BYTES + 1)
+    if len(contents) > MAX_UPLOAD_BYTES:
+        raise _too_large()
+    return contents
+
+@lru_cache(maxsize=32)
+def _is_async(fn) -> bool:
+    # Resolved once per function object: agents.* are coroutine functions, tests monkeypatch sync ones
+    return inspect.iscoroutinefunction(fn)
+
+
+async def _call_agent(fn, *args, **kwargs):
+    if _is_async(fn):
+        return await fn(*args, **kwargs)
+    res = fn(*args, **kwargs)
+    return await res if inspect.isawaitable(res) else res
+
+
+def _model_response(model: BaseModel) -> Response:
+    # pydantic-core writes the JSON directly; no intermediate dict or second encoder pass
+    return Response(content=model.model_dump_json(), media_type="application/json")
+
 
 @app.get("/", response_class=HTMLResponse)
 async def root():
@@ -91,9 +303,7 @@ class VacancyRequest(BaseModel):
 @app.post("/analyze-job-vacancy")
 async def api_analyze_job_vacancy(
     req: VacancyRequest,
-    x_openai_key: str | None = Header(default=None, alias="X-OpenAI-Key"),
-    x_llm_provider: str | None = Header(default=None, alias="X-LLM-Provider"),
-    x_llm_model: str | None = Header(default=None, alias="X-LLM-Model"),
+    llm: LLMHeaders = Depends(require_llm_headers),
 ):
     try:
         # Input validation
@@ -110,105 +320,180 @@ async def api_analyze_job_vacancy(
                 detail="Vacancy text too large. Maximum 50,000 characters allowed."
             )
         
-        logfire.info("/analyze-job-vacancy request", extra={
-            "request_id": getattr(locals().get('req', None), 'request_id', None) or getattr(locals().get('request', None), 'state', None) and getattr(locals().get('request').state, 'request_id', None),
-            "provider": (x_llm_provider or "openai").lower() if x_llm_provider is not None else "openai",
-            "model": x_llm_model or "gpt-4o",
-            "text_length": len(req.vacancy_text)
-        })
-        
-        if REQUIRE_USER_API_KEY and not x_openai_key:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="X-OpenAI-Key is required")
-        provider = (x_llm_provider or "openai").lower()
-        if provider != "openai":
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"LLM provider '{provider}' not supported yet")
-        
+        logfire.info(
+            "/analyze-job-vacancy request",
+            provider=llm.provider,
+            model=llm.model or "gpt-4o",
+            text_length=len(req.vacancy_text),
+        )
+
         # Support both async and sync agent implementations (tests monkeypatch a sync fn)
-        res = agents.analyze_job_vacancy(req.vacancy_text.strip(), api_key=x_openai_key, provider=provider, model=x_llm_model)
-        result = await res if inspect.isawaitable(res) else res
-        return result.model_dump()
+        result = await _call_agent(agents.analyze_job_vacancy, req.vacancy_text.strip(), api_key=llm.api_key, provider=llm.provider, model=llm.model)
+        return _model_response(result)
     except HTTPException:
         raise
     except Exception as e:
         logfire.error(f"Unexpected error in analyze_job_vacancy: {e}")
         raise HTTPException(status_code=500, detail="Internal server error during job analysis")
 
-@app.post("/analyze-cv")
+@app.post("/analyze-cv", openapi_extra=_multipart_openapi(["file"], {"file": _PDF_FILE_FIELD}))
 async def api_analyze_cv(
     request: Request,
-    file: UploadFile = File(...),
-    x_openai_key: str | None = Header(default=None, alias="X-OpenAI-Key"),
-    x_llm_provider: str | None = Header(default=None, alias="X-LLM-Provider"),
-    x_llm_model: str | None = Header(default=None, alias="X-LLM-Model"),
+    llm: LLMHeaders = Depends(require_llm_headers),
     x_job_context: str | None = Header(default=None, alias="X-Job-Context"),
 ):
     try:
-        if REQUIRE_USER_API_KEY and not x_openai_key:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="X-OpenAI-Key is required")
-        provider = (x_llm_provider or "openai").lower()
-        if provider != "openai":
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"LLM provider '{provider}' not supported yet")
-        # Enforce Content-Length if provided
-        content_length = request.headers.get("content-length")
-        if content_length is not None:
-            try:
-                if int(content_length) > MAX_UPLOAD_BYTES:
-                    raise HTTPException(
-                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                        detail=f"File too large. Max {MAX_UPLOAD_MB}MB",
-                    )
-            except ValueError:
-                # ignore malformed header and continue with on-disk size validation
-                pass
-        # Ensure the file is a PDF
-        if not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Only PDF files are accepted"
-            )
-        
-        # Save the uploaded file
-        file_path = UPLOAD_DIR / file.filename
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        # Verify size on disk
-        try:
-            if file_path.stat().st_size > MAX_UPLOAD_BYTES:
-                file_path.unlink(missing_ok=True)
-                raise HTTPException(
-                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                    detail=f"File too large. Max {MAX_UPLOAD_MB}MB",
-                )
-        except FileNotFoundError:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Upload failed: file missing after write"
-            )
-        
+        # The form (and its spooled upload) is closed as soon as the bytes are read
+        async with _upload_form(request) as form:
+            contents = await _read_upload(_form_file(form))
+
         # Analyze the CV with job context if provided (support sync/async monkeypatches)
-        res = agents.analyze_cv(file_path, api_key=x_openai_key, provider=provider, model=x_llm_model, job_context=x_job_context)
-        result = await res if inspect.isawaitable(res) else res
-
-        # Delete immediately unless retention is enabled
-        if not RETAIN_UPLOADED_CVS:
-            try:
-                file_path.unlink(missing_ok=True)
-            except Exception:
-                # Best-effort deletion; do not fail the request
-                pass
-
-        return result.model_dump()
+        result = await _call_agent(agents.analyze_cv, contents, api_key=llm.api_key, provider=llm.provider, model=llm.model, job_context=x_job_context)
+
+        return _model_response(result)
         
-    except HTTPException:
+    # Starlette's base class: form parsing raises it for malformed multipart (400)
+    except StarletteHTTPException:
         raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error processing CV: {str(e)}"
         )
-    finally:
-        if 'file' in locals():
-            await file.close()
+
+
+def _norm_set(items) -> frozenset[str]:
+    # Case/whitespace-insensitive set of non-empty entries; one strip per item
+    return frozenset(n for n in (str(x).strip().lower() for x in items or ()) if n)
+
+
+def _postprocess_score(data: dict, cv: CVAnalysis, job: JobRequirements) -> dict:
+    """Apply post-processing safeguards to a dumped MatchingScore."""
+    # 1) Prevent an overall 0% if components indicate non-zero match.
+    try:
+        comps = [
+            int(data.get("technical_skills_score", 0) or 0),
+            int(data.get("soft_skills_score", 0) or 0),
+            int(data.get("experience_score", 0) or 0),
+            int(data.get("key_responsibilities_score", 0) or 0),
+        ]
+        if data.get("overall_match_score", 0) == 0 and any(c > 0 for c in comps):
+            avg = int(sum(comps) / max(1, len(comps)))
+            data["overall_match_score"] = avg
+            if not data.get("overall_explanation"):
+                data["overall_explanation"] = "Adjusted to average of component scores due to detected intersections."
+    except Exception:
+        pass
+
+    # 2) Ensure strengths emphasize real intersections between CV and Job
+    try:
+        strengths = data.get("strengths") or []
+
+        # Build intersections across categories (each list normalized once)
+        info = cv.key_information
+        tech_overlap = _norm_set(info.technical_skills) & _norm_set(job.required_skills.technical)
+        soft_overlap = _norm_set(info.soft_skills) & _norm_set(job.required_skills.soft)
+        lang_overlap = _norm_set(info.languages) & _norm_set(job.languages)
+        resp_overlap = _norm_set(info.responsibilities) & _norm_set(job.responsibilities)
+
+        # If provided strengths are empty or contain items not in overlaps, replace with overlaps (top 10)
+        if not strengths or not _norm_set(strengths) <= (tech_overlap | soft_overlap | lang_overlap | resp_overlap):
+            overlaps = [s.title() for s in sorted(tech_overlap)]
+            overlaps.extend(s.title() for s in sorted(soft_overlap))
+            overlaps.extend(s.title() for s in sorted(lang_overlap))
+            overlaps.extend(sorted(resp_overlap))
+            data["strengths"] = overlaps[:10]
+    except Exception:
+        pass
+    return data
+
+
+def _as_list(value) -> list:
+    # Lists (what JSON decoding yields) are passed through as-is; the models
+    # copy them on validation, so no defensive list() per field is needed
+    if type(value) is list:
+        return value
+    return list(value) if value else []
+
+
+def _first_list(d: dict, keys: tuple[str, ...]) -> list:
+    """First non-empty list among the alternative keys (LLM output variants)."""
+    for key in keys:
+        value = d.get(key)
+        if value and isinstance(value, list):
+            return value
+    return []
+
+
+_CV_KEY_INFO_LISTS = ("technical_skills", "soft_skills", "certifications", "languages", "responsibilities")
+_CV_RECOMMENDATION_LISTS = ("tailoring", "interview_focus", "career_development")
+
+
+def _sanitize_job(req_dict: dict) -> dict:
+    # Only keep known keys; default nested structures where missing
+    jr = req_dict or {}
+    get = jr.get
+    # Start with direct mappings
+    req_skills = get("required_skills") or {}
+    # Heuristic mappings from alternative keys commonly returned by LLMs
+    # e.g., flat 'skills' list or separate 'technical_skills'/'soft_skills'
+    tech = _as_list(req_skills.get("technical")) or _as_list(get("technical_skills"))
+    soft = _as_list(req_skills.get("soft")) or _as_list(get("soft_skills"))
+    # If only a flat list of skills is provided, assume technical by default
+    if not tech and not soft:
+        tech = _first_list(jr, ("skills",))
+
+    # Responsibilities may be provided under different keys; some LLMs put
+    # bullet points under 'requirements' mixing skills and duties
+    responsibilities = _as_list(get("responsibilities")) or _first_list(jr, ("tasks", "requirements"))
+    # Sometimes under 'language_requirements'
+    languages = _as_list(get("languages")) or _first_list(jr, ("language_requirements",))
+
+    exp = get("experience") or {}
+    return {
+        "required_skills": {
+            "technical": tech,
+            "soft": soft,
+        },
+        "experience": {
+            "minimum_years": exp.get("minimum_years"),
+            "industry": exp.get("industry"),
+            "type": exp.get("type"),
+            "leadership": exp.get("leadership"),
+        },
+        "responsibilities": responsibilities,
+        "languages": languages,
+        "seniority_level": get("seniority_level"),
+    }
+
+
+def _sanitize_cv(cv_dict: dict) -> dict:
+    cv = cv_dict or {}
+    # recommendations may be object or array
+    rec = cv.get("recommendations")
+    if isinstance(rec, list):
+        recommendations = {"tailoring": rec, "interview_focus": [], "career_development": []}
+    elif isinstance(rec, dict):
+        recommendations = {k: _as_list(rec.get(k)) for k in _CV_RECOMMENDATION_LISTS}
+    else:
+        recommendations = {"tailoring": [], "interview_focus": [], "career_development": []}
+
+    # Heuristic enrichments for key_information if provided at top-level,
+    # to avoid empty comparisons
+    key_info_in = cv.get("key_information") or cv
+    candidate_in = cv.get("candidate_suitability") or {}
+    key_information = {"experience_summary": key_info_in.get("experience_summary") or ""}
+    key_information.update((k, _as_list(key_info_in.get(k))) for k in _CV_KEY_INFO_LISTS)
+    return {
+        "candidate_suitability": {
+            "overall_fit_score": candidate_in.get("overall_fit_score") or 5,
+            "justification": candidate_in.get("justification") or "",
+            "strengths": _as_list(candidate_in.get("strengths")),
+            "gaps": _as_list(candidate_in.get("gaps")),
+        },
+        "key_information": key_information,
+        "recommendations": recommendations,
+    }
 
 
 class ScoreRequest(BaseModel):
@@ -218,173 +503,138 @@ class ScoreRequest(BaseModel):
 @app.post("/score-cv-match")
 async def api_score_cv_match(
     req: ScoreRequest,
-    x_openai_key: str | None = Header(default=None, alias="X-OpenAI-Key"),
-    x_llm_provider: str | None = Header(default=None, alias="X-LLM-Provider"),
-    x_llm_model: str | None = Header(default=None, alias="X-LLM-Model"),
+    llm: LLMHeaders = Depends(require_llm_headers),
 ):
     try:
         # Align scoring to the same LLM pipeline and quality as CV/Job analysis
-        if REQUIRE_USER_API_KEY and not x_openai_key:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="X-OpenAI-Key is required")
-        provider = (x_llm_provider or "openai").lower()
-        if provider != "openai":
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"LLM provider '{provider}' not supported yet")
-        def _sanitize_job(req_dict: dict) -> dict:
-            # Only keep known keys; default nested structures where missing
-            jr = req_dict or {}
-            # Start with direct mappings
-            req_skills = jr.get("required_skills") or {}
-            tech = list(req_skills.get("technical", []) or [])
-            soft = list(req_skills.get("soft", []) or [])
-
-            # Heuristic mappings from alternative keys commonly returned by LLMs
-            # e.g., flat 'skills' list or separate 'technical_skills'/'soft_skills'
-            if not tech:
-                tech = list(jr.get("technical_skills", []) or [])
-            if not soft:
-                soft = list(jr.get("soft_skills", []) or [])
-            # If only a flat list of skills is provided, assume technical by default
-            if not tech and not soft and isinstance(jr.get("skills"), list):
-                tech = list(jr.get("skills") or [])
-
-            # Responsibilities may be provided under different keys
-            responsibilities = list(jr.get("responsibilities", []) or [])
-            if not responsibilities and isinstance(jr.get("tasks"), list):
-                responsibilities = list(jr.get("tasks") or [])
-            # Some LLMs put bullet points under 'requirements' mixing skills and duties
-            if not responsibilities and isinstance(jr.get("requirements"), list):
-                responsibilities = list(jr.get("requirements") or [])
-
-            languages = list(jr.get("languages", []) or [])
-            if not languages:
-                # Sometimes under 'language_requirements'
-                alt_lang = jr.get("language_requirements")
-                if isinstance(alt_lang, list):
-                    languages = list(alt_lang)
-
-            out = {
-                "required_skills": {
-                    "technical": tech,
-                    "soft": soft,
-                },
-                "experience": {
-                    "minimum_years": (jr.get("experience") or {}).get("minimum_years"),
-                    "industry": (jr.get("experience") or {}).get("industry"),
-                    "type": (jr.get("experience") or {}).get("type"),
-                    "leadership": (jr.get("experience") or {}).get("leadership"),
-                },
-                "responsibilities": responsibilities,
-                "languages": languages,
-                "seniority_level": jr.get("seniority_level"),
-            }
-            return out
-
-        def _sanitize_cv(cv_dict: dict) -> dict:
-            cv = cv_dict or {}
-            # recommendations may be object or array
-            rec = cv.get("recommendations")
-            if isinstance(rec, list):
-                recommendations = {
-                    "tailoring": list(rec),
-                    "interview_focus": [],
-                    "career_development": [],
-                }
-            elif isinstance(rec, dict):
-                recommendations = {
-                    "tailoring": list(rec.get("tailoring", []) or []),
-                    "interview_focus": list(rec.get("interview_focus", []) or []),
-                    "career_development": list(rec.get("career_development", []) or []),
-                }
-            else:
-                recommendations = {"tailoring": [], "interview_focus": [], "career_development": []}
-
-            key_info_in = cv.get("key_information") or {}
-            candidate_in = cv.get("candidate_suitability") or {}
-            # Heuristic enrichments for key_information if provided at top-level
-            if not key_info_in:
-                # Accept top-level fallbacks to avoid empty comparisons
-                key_info_in = {
-                    "experience_summary": cv.get("experience_summary") or "",
-                    "technical_skills": list(cv.get("technical_skills", []) or []),
-                    "soft_skills": list(cv.get("soft_skills", []) or []),
-                    "certifications": list(cv.get("certifications", []) or []),
-                    "languages": list(cv.get("languages", []) or []),
-                    "responsibilities": list(cv.get("responsibilities", []) or []),
-                }
-            out = {
-                "candidate_suitability": {
-                    "overall_fit_score": candidate_in.get("overall_fit_score") or 5,
-                    "justification": candidate_in.get("justification") or "",
-                    "strengths": list(candidate_in.get("strengths", []) or []),
-                    "gaps": list(candidate_in.get("gaps", []) or []),
-                },
-                "key_information": {
-                    "experience_summary": key_info_in.get("experience_summary") or "",
-                    "technical_skills": list(key_info_in.get("technical_skills", []) or []),
-                    "soft_skills": list(key_info_in.get("soft_skills", []) or []),
-                    "certifications": list(key_info_in.get("certifications", []) or []),
-                    "languages": list(key_info_in.get("languages", []) or []),
-                    "responsibilities": list(key_info_in.get("responsibilities", []) or []),
-                },
-                "recommendations": recommendations,
-            }
-            return out
-
         cv_obj = CVAnalysis(**_sanitize_cv(req.cv_analysis))
         job_obj = JobRequirements(**_sanitize_job(req.job_requirements))
         # Delegate scoring to agents (LLM-based) for better intersection-focused results
-        res = agents.score_cv_match(cv_obj, job_obj, api_key=x_openai_key, provider=provider, model=x_llm_model)
-        result = await res if inspect.isawaitable(res) else res
+        result = await _call_agent(agents.score_cv_match, cv_obj, job_obj, api_key=llm.api_key, provider=llm.provider, model=llm.model)
         data = result.model_dump()
 
-        # --- Post-processing safeguards ---
-        # 1) Prevent an overall 0% if components indicate non-zero match.
+        return ORJSONResponse(_postprocess_score(data, cv_obj, job_obj))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"scoring_error: {e}")
+
+
+@app.post("/analyze-and-score", openapi_extra=_multipart_openapi(["file"], {
+    "file": _PDF_FILE_FIELD,
+    "vacancy_text": {"type": "string"},
+    "job_requirements": {"type": "string", "description": "JSON from /analyze-job-vacancy"},
+}))
+async def api_analyze_and_score(
+    request: Request,
+    llm: LLMHeaders = Depends(require_llm_headers),
+):
+    """
+    Analyze a CV and score it against a vacancy.
+
+    With `job_requirements` (JSON from /analyze-job-vacancy) the CV analysis and
+    scoring are fused into one LLM call; otherwise `vacancy_text` is analyzed
+    concurrently with the CV and then scored.
+    """
+    try:
+        async with _upload_form(request) as form:
+            vacancy_text = _form_text(form, "vacancy_text")
+            job_requirements = _form_text(form, "job_requirements")
+            file = _form_file(form)
+            job_obj = None
+            if job_requirements:
+                try:
+                    job_obj = JobRequirements(**_sanitize_job(json.loads(job_requirements)))
+                except Exception as e:
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid job_requirements: {e}")
+            else:
+                if not vacancy_text or not vacancy_text.strip():
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Vacancy text cannot be empty")
+                if len(vacancy_text) > 50000:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail="Vacancy text too large. Maximum 50,000 characters allowed."
+                    )
+            contents = await _read_upload(file)
+
+        if job_obj is not None:
+            cv_obj, score = await _call_agent(agents.analyze_cv_and_score, contents, job_obj, api_key=llm.api_key, provider=llm.provider, model=llm.model)
+        else:
+            job_obj, cv_obj, score = await _call_agent(agents.analyze_and_score, vacancy_text.strip(), contents, api_key=llm.api_key, provider=llm.provider, model=llm.model)
+
+        return ORJSONResponse({
+            "job_requirements": job_obj.model_dump(),
+            "cv_analysis": cv_obj.model_dump(),
+            "match_score": _postprocess_score(score.model_dump(), cv_obj, job_obj),
+        })
+    # Starlette's base class: form parsing raises it for malformed multipart (400)
+    except StarletteHTTPException:
+        raise
+    except Exception as e:
+        logfire.error(f"Unexpected error in analyze_and_score: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error processing analysis: {str(e)}"
+        )
+
+
+class BatchSubmitRequest(BaseModel):
+    vacancies: list[str] = []
+    matches: list[ScoreRequest] = []
+
+@app.post("/batch/submit")
+async def api_batch_submit(
+    req: BatchSubmitRequest,
+    llm: LLMHeaders = Depends(require_llm_headers),
+):
+    """Queue vacancy analyses and CV/job scorings on the OpenAI Batch API (~50% cheaper, up to 24h)."""
+    try:
+        if not req.vacancies and not req.matches:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nothing to submit")
+        if len(req.vacancies) + len(req.matches) > batch.MAX_BATCH_REQUESTS:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Too many batch requests. Maximum {batch.MAX_BATCH_REQUESTS} vacancies + matches per submit."
+            )
+        vacancies = []
+        for text in req.vacancies:
+            if not text or not text.strip():
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Vacancy text cannot be empty")
+            if len(text) > 50000:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail="Vacancy text too large. Maximum 50,000 characters allowed."
+                )
+            vacancies.append(text.strip())
         try:
-            comps = [
-                int(data.get("technical_skills_score", 0) or 0),
-                int(data.get("soft_skills_score", 0) or 0),
-                int(data.get("experience_score", 0) or 0),
-                int(data.get("key_responsibilities_score", 0) or 0),
+            matches = [
+                (CVAnalysis(**_sanitize_cv(m.cv_analysis)), JobRequirements(**_sanitize_job(m.job_requirements)))
+                for m in req.matches
             ]
-            if data.get("overall_match_score", 0) == 0 and any(c > 0 for c in comps):
-                avg = int(sum(comps) / max(1, len(comps)))
-                data["overall_match_score"] = avg
-                if not data.get("overall_explanation"):
-                    data["overall_explanation"] = "Adjusted to average of component scores due to detected intersections."
-        except Exception:
-            pass
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"scoring_error: {e}")
+
+        return ORJSONResponse(await batch.submit_batch(vacancies, matches, api_key=llm.api_key, provider=llm.provider, model=llm.model))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logfire.error(f"Unexpected error in batch submit: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error during batch submit")
 
-        # 2) Ensure strengths emphasize real intersections between CV and Job
-        try:
-            cv = cv_obj
-            job = job_obj
-            strengths = list(data.get("strengths") or [])
-
-            # Build intersections across categories
-            def _norm_set(items):
-                return {str(x).strip().lower() for x in (items or []) if str(x).strip()}
-
-            tech_overlap = sorted(_norm_set(cv.key_information.technical_skills) & _norm_set(job.required_skills.technical))
-            soft_overlap = sorted(_norm_set(cv.key_information.soft_skills) & _norm_set(job.required_skills.soft))
-            lang_overlap = sorted(_norm_set(cv.key_information.languages) & _norm_set(job.languages))
-            resp_overlap = sorted(_norm_set(cv.key_information.responsibilities) & _norm_set(job.responsibilities))
-
-            overlaps = []
-            overlaps.extend([s.title() for s in tech_overlap])
-            overlaps.extend([s.title() for s in soft_overlap])
-            overlaps.extend([s.title() for s in lang_overlap])
-            overlaps.extend([s for s in resp_overlap])
-
-            # If provided strengths are empty or contain items not in overlaps, replace with overlaps (top 10)
-            normalized_strengths = _norm_set(strengths)
-            if not strengths or not normalized_strengths.issubset(_norm_set(overlaps)):
-                data["strengths"] = overlaps[:10]
-        except Exception:
-            pass
 
-        return data
+@app.get("/batch/results/{batch_id}")
+async def api_batch_results(
+    batch_id: str,
+    x_openai_key: str | None = Header(default=None, alias="X-OpenAI-Key"),
+):
+    """Return batch status and, once completed, the parsed results keyed by custom_id."""
+    try:
+        if REQUIRE_USER_API_KEY and not x_openai_key:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="X-OpenAI-Key is required")
+        return ORJSONResponse(await batch.get_batch_results(batch_id, api_key=x_openai_key))
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=400, detail=f"scoring_error: {e}")
+        logfire.error(f"Unexpected error in batch results: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error while fetching batch results")
 
 
 @app.get("/healthz")
@@ -392,18 +642,55 @@ async def healthz():
     return {"status": "ok"}
 
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """Per-stage (vacancy/cv/score/cvscore) hit rates of the in-process response cache; counts only, no keys."""
+    return shared_cache.stats()
+
+
 # --- Public Policy Pages (served strictly from static files) ---
+# Policy pages change rarely but do change, so cache for an hour and let
+# browsers revalidate with the ETag FileResponse derives from mtime/size.
+_POLICY_CACHE_CONTROL = "public, max-age=3600"
+
+def _policy_page(request: Request, name: str) -> Response:
+    static_path = STATIC_DIR / name
+    try:
+        # One stat serves both the existence check and the ETag/Last-Modified headers
+        stat_result = static_path.stat()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"{name} not found under /static")
+    response = FileResponse(
+        str(static_path), media_type="text/html", stat_result=stat_result,
+        headers={"Cache-Control": _POLICY_CACHE_CONTROL},
+    )
+    etag = response.headers["etag"]
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": _POLICY_CACHE_CONTROL})
+    return response
+
+
 @app.get("/privacy", response_class=HTMLResponse)
-async def privacy_policy():
-    static_path = Path(__file__).parent / "static" / "privacy.html"
-    if static_path.exists():
-        return FileResponse(str(static_path), media_type="text/html")
-    raise HTTPException(status_code=404, detail="privacy.html not found under /static")
+async def privacy_policy(request: Request):
+    return _policy_page(request, "privacy.html")
 
 
 @app.get("/terms", response_class=HTMLResponse)
-async def terms_of_service():
-    static_path = Path(__file__).parent / "static" / "terms.html"
-    if static_path.exists():
-        return FileResponse(str(static_path), media_type="text/html")
-    raise HTTPException(status_code=404, detail="terms.html not found under /static")
+async def terms_of_service(request: Request):
+    return _policy_page(request, "terms.html")
+
+
+if __name__ == "__main__":
+    # Local/dev entry point; production runs gunicorn with UvicornWorker (see Dockerfile).
+    # uvloop and httptools ship with uvicorn[standard]; uvloop has no Windows build.
+    import sys
+    import uvicorn
+
+    uvicorn.run(
+        "app:app",
+        host=os.getenv("HOST", "127.0.0.1"),
+        port=int(os.getenv("PORT", "8000")),
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        workers=int(os.getenv("UVICORN_WORKERS", "1")),
+    )
@@ -0,0 +1,231 @@
+"""
+OpenAI Batch API support for non-interactive (bulk) workloads.
+
+Batch jobs trade turnaround time (up to 24h) for ~50% lower token cost and
+higher rate limits, which suits offline screening of many vacancies or
+CV/job pairs. Requests are serialized into a JSONL file, uploaded with
+purpose="batch", and the results are parsed back into the same Pydantic
+models the interactive agents return.
+
+Each request's custom_id is the interactive cache key for the same input, so:
+- inputs already in `shared_cache` or `batch_cache` are answered immediately
+  and not resubmitted
+- inputs pending in another batch are not submitted twice while that batch
+  can still complete (markers live in `batch_cache` for the completion window)
+- completed batch results are kept in `batch_cache`, where a later interactive
+  call for the same input finds them (agents.cached_result)
+
+Pending markers and results are in-process: a restart or another worker
+does not see them. `batch_cache` holds MAX_BATCH_REQUESTS * 10 entries, so
+up to ten full batches can be in flight before the oldest markers are evicted.
+"""
+import io
+import orjson
+from typing import Any
+
+import logfire
+from pydantic import BaseModel, ValidationError
+
+import agents
+from cache_utils import batch_cache, shared_cache
+from enhanced_prompts import enhanced_prompts
+from models import JobRequirements, CVAnalysis, MatchingScore
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+# Requests per submit; a bigger one would evict its own pending markers
+MAX_BATCH_REQUESTS = batch_cache.maxsize // 10
+
+# Output model and agent task per custom_id prefix (the cache key namespace)
+_OUTPUT_TYPES: dict[str, type[BaseModel]] = {
+    "vacancy": JobRequirements,
+    "score": MatchingScore,
+}
+_TASKS: dict[str, str] = {
+    "vacancy": "job",
+    "score": "score",
+}
+
+
+# Final batch statuses; expired/cancelled batches may still hold partial output
+_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def _pending_key(custom_id: str) -> str:
+    return f"batch-pending:{custom_id}"
+
+
+def _batch_ids_key(batch_id: str) -> str:
+    return f"batch-ids:{batch_id}"
+
+
+def _request_line(custom_id: str, model_norm: str, system_prompt: str, user_prompt: str, output_type: type[BaseModel]) -> dict[str, Any]:
+    """Build one Batch API JSONL request with a JSON-schema response format."""
+    settings = agents.task_model_settings(_TASKS[custom_id.split(":", 1)[0]])
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": {
+            "model": model_norm,
+            "temperature": settings["temperature"],
+            "max_tokens": settings["max_tokens"],
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": output_type.__name__,
+                    "schema": agents.OUTPUT_JSON_SCHEMAS[output_type],
+                    "strict": True,
+                },
+            },
+        },
+    }
+
+
+async def submit_batch(
+    vacancies: list[str],
+    matches: list[tuple[CVAnalysis, JobRequirements]],
+    api_key: str | None = None,
+    provider: str | None = None,
+    model: str | None = None,
+) -> dict[str, Any]:
+    """
+    Submit vacancy analyses and CV/job scorings as one OpenAI batch.
+
+    Returns the batch id (None when nothing needed submitting) together with
+    the custom_ids that were submitted, already cached, or already pending.
+    """
+    provider_norm = (provider or 'openai').lower()
+    model_norm = (model or '').strip() or 'gpt-4o'
+
+    candidates: list[tuple[str, str, str, str, type[BaseModel]]] = []
+    for vacancy_text in vacancies:
+        candidates.append((
+            agents.vacancy_cache_key(vacancy_text, provider_norm, model_norm),
+            model_norm,
+            enhanced_prompts.get_job_analysis_prompt(vacancy_text),
+            agents.job_user_prompt(vacancy_text),
+            JobRequirements,
+        ))
+    # Batch scoring is a single call per pair; with no explicit model it uses the
+    # small scoring model (its key differs from the interactive multi-vote key)
+    score_model_norm = agents.score_model(model)[0]
+    for cv_analysis, job_requirements in matches:
+        job_json = job_requirements.model_dump_json()
+        payload = agents.score_payload(cv_analysis.model_dump_json(), job_json)
+        candidates.append((
+            agents.score_cache_key(payload, provider_norm, score_model_norm),
+            score_model_norm,
+            agents.score_system_prompt(job_json),
+            agents.score_user_prompt(payload),
+            MatchingScore,
+        ))
+
+    cached: list[str] = []
+    pending: dict[str, str] = {}
+    lines: list[dict[str, Any]] = []
+    seen: set[str] = set()
+    for custom_id, line_model, system_prompt, user_prompt, output_type in candidates:
+        if custom_id in seen:
+            continue
+        seen.add(custom_id)
+        if await shared_cache.get(custom_id) is not None or await batch_cache.get(custom_id) is not None:
+            cached.append(custom_id)
+            continue
+        pending_batch = await batch_cache.get(_pending_key(custom_id))
+        if pending_batch is not None:
+            pending[custom_id] = pending_batch
+            continue
+        lines.append(_request_line(custom_id, line_model, system_prompt, user_prompt, output_type))
+
+    result: dict[str, Any] = {
+        "batch_id": None,
+        "status": None,
+        "submitted": [line["custom_id"] for line in lines],
+        "cached": cached,
+        "pending": pending,
+    }
+    if not lines:
+        return result
+
+    # Batch API calls have no outer retry loop; keep the SDK's own retries
+    client = agents.get_openai_client(api_key).with_options(max_retries=2)
+    jsonl = b"\n".join(orjson.dumps(line) for line in lines)
+    input_file = await client.files.create(file=("batch.jsonl", io.BytesIO(jsonl)), purpose="batch")
+    batch = await client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=COMPLETION_WINDOW,
+    )
+    for line in lines:
+        await batch_cache.set(_pending_key(line["custom_id"]), batch.id)
+    # get_batch_results() clears the markers of inputs the batch did not answer
+    await batch_cache.set(_batch_ids_key(batch.id), result["submitted"])
+    logfire.info("batch submitted", batch_id=batch.id, requests=len(lines), model=model_norm)
+
+    result["batch_id"] = batch.id
+    result["status"] = batch.status
+    return result
+
+
+async def get_batch_results(batch_id: str, api_key: str | None = None) -> dict[str, Any]:
+    """
+    Fetch a batch's status and, once it has finished, its parsed results.
+
+    Results are validated against their output model and stored in
+    `batch_cache` under their custom_id (the interactive cache key). Once the
+    batch is final (completed, failed, expired or cancelled), inputs without a
+    result lose their pending marker so the next submit sends them again.
+    """
+    # Batch API calls have no outer retry loop; keep the SDK's own retries
+    client = agents.get_openai_client(api_key).with_options(max_retries=2)
+    batch = await client.batches.retrieve(batch_id)
+    counts = batch.request_counts
+    out: dict[str, Any] = {
+        "batch_id": batch.id,
+        "status": batch.status,
+        "request_counts": counts.model_dump() if counts is not None else None,
+        "results": {},
+        "errors": {},
+    }
+    if batch.status not in _TERMINAL_STATUSES:
+        return out
+
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        content = await client.files.content(file_id)
+        for raw in content.text.splitlines():
+            if not raw.strip():
+                continue
+            line = orjson.loads(raw)
+            custom_id = line.get("custom_id")
+            if not custom_id:
+                continue
+            try:
+                response = line.get("response") or {}
+                if line.get("error") or response.get("status_code") != 200:
+                    raise ValueError(line.get("error") or response.get("body"))
+                output_type = _OUTPUT_TYPES[custom_id.split(":", 1)[0]]
+                message = response["body"]["choices"][0]["message"]["content"]
+                parsed = output_type.model_validate_json(message)
+            except (KeyError, IndexError, TypeError, ValueError, ValidationError) as e:
+                out["errors"][custom_id] = str(e)
+                continue
+            await batch_cache.set(custom_id, parsed)
+            out["results"][custom_id] = parsed.model_dump()
+
+    # Errored or never-run inputs are not pending anymore (unless since resubmitted)
+    unanswered = set(out["errors"]).union((await batch_cache.get(_batch_ids_key(batch.id))) or ())
+    for custom_id in unanswered.difference(out["results"]):
+        if await batch_cache.get(_pending_key(custom_id)) == batch.id:
+            await batch_cache.delete(_pending_key(custom_id))
+    logfire.info(
+        "batch results fetched",
+        batch_id=batch.id, results=len(out["results"]), errors=len(out["errors"]),
+    )
+    return out
@@ -0,0 +1,78 @@
+"""
+Coalescing micro-batcher for concurrent LLM requests.
+
+Requests that arrive within `max_wait_ms` of each other and share a group key
+(same API key, provider, model and system prompt) are flushed together into a
+single `run_batch(group, items)` call, which must return one result per item
+in order. A group is flushed early once it reaches `max_batch` items.
+
+- in-process only; each worker batches its own traffic
+- a failed batch call fails every waiter in that batch with the same exception
+- opt-in via BATCH_ENABLED=1 (knobs: BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS)
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Hashable
+
+BATCH_ENABLED = os.getenv("BATCH_ENABLED", "false").lower() in {"1", "true", "yes"}
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = int(os.getenv("BATCH_MAX_WAIT_MS", "50"))
+
+
+class Batcher:
+    """
+    Group concurrent submissions per key and run them as one batch call.
+    - flush triggers: batch reaches max_batch, or max_wait_ms after the first item
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[Hashable, list[Any]], Awaitable[list[Any]]],
+        max_batch: int = 16,
+        max_wait_ms: int = 50,
+    ):
+        self._run_batch = run_batch
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0, max_wait_ms) / 1000
+        self._pending: dict[Hashable, list[tuple[Any, asyncio.Future]]] = {}
+        self._timers: dict[Hashable, asyncio.TimerHandle] = {}
+        # keep strong references so running batch tasks are not garbage collected
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, group: Hashable, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        batch = self._pending.setdefault(group, [])
+        batch.append((item, fut))
+        if len(batch) >= self.max_batch:
+            self._flush(group)
+        elif group not in self._timers:
+            self._timers[group] = loop.call_later(self.max_wait, self._flush, group)
+        return await fut
+
+    def _flush(self, group: Hashable) -> None:
+        timer = self._timers.pop(group, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(group, None)
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run(group, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, group: Hashable, batch: list[tuple[Any, asyncio.Future]]) -> None:
+        try:
+            results = await self._run_batch(group, [item for item, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"Batch returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
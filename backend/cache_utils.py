@@ -2,57 +2,169 @@ from __future__ import annotations
 
 import asyncio
 import time
-from collections import OrderedDict
+from collections import Counter, OrderedDict
 from typing import Any, Callable, Optional, Awaitable
 
 
 class TTLCache:
     """
     Simple in-memory TTL cache with an LRU eviction policy.
-    - thread/async safe via a single asyncio.Lock
+    - async safe: reads are lock-free, writes/eviction take one asyncio.Lock
+    - single-flight: concurrent misses on one key share a single computation
     - no external storage
+    - hit/miss counters per stage (key prefix before the first ':', e.g. vacancy/cv/score)
     """
 
     def __init__(self, maxsize: int = 256, ttl_seconds: int = 900):
         self.maxsize = maxsize
         self.ttl = ttl_seconds
+        # (time.monotonic() at insert, value): TTLs are immune to wall-clock jumps;
+        # snapshots store ages, so no timestamp ever leaves the process
         self._store: OrderedDict[str, tuple[float, Any]] = OrderedDict()
         self._lock = asyncio.Lock()
+        self._hits: Counter[str] = Counter()
+        self._misses: Counter[str] = Counter()
+        # In-flight computations by key: concurrent identical misses await the
+        # first caller's result instead of paying for a duplicate LLM call
+        self._inflight: dict[str, asyncio.Future] = {}
 
-    def _is_expired(self, ts: float) -> bool:
-        return (time.time() - ts) > self.ttl
+    def _is_expired(self, ts: float, now: float) -> bool:
+        return (now - ts) > self.ttl
 
     async def get(self, key: str) -> Optional[Any]:
-        async with self._lock:
-            item = self._store.get(key)
-            if not item:
-                return None
-            ts, value = item
-            if self._is_expired(ts):
-                # expired
-                self._store.pop(key, None)
-                return None
-            # touch for LRU
-            self._store.move_to_end(key)
-            return value
+        # Lock-free: nothing below awaits, so no other coroutine can interleave
+        # with the lookup, expiry pop and LRU touch
+        stage = key.split(":", 1)[0]
+        item = self._store.get(key)
+        if not item:
+            self._misses[stage] += 1
+            return None
+        ts, value = item
+        if self._is_expired(ts, time.monotonic()):
+            # expired
+            self._store.pop(key, None)
+            self._misses[stage] += 1
+            return None
+        # touch for LRU
+        self._store.move_to_end(key)
+        self._hits[stage] += 1
+        return value
 
     async def set(self, key: str, value: Any) -> None:
         async with self._lock:
             if key in self._store:
                 self._store.move_to_end(key)
-            self._store[key] = (time.time(), value)
-            # evict
-            while len(self._store) > self.maxsize:
+            self._store[key] = (time.monotonic(), value)
+            # evict: one insert overshoots by at most one entry
+            if len(self._store) > self.maxsize:
                 self._store.popitem(last=False)
 
+    async def delete(self, key: str) -> None:
+        async with self._lock:
+            self._store.pop(key, None)
+
+    def purge_expired(self) -> int:
+        """Drop every expired entry (not only the ones read again); returns how many were dropped."""
+        now = time.monotonic()
+        # get() refreshes LRU order but not timestamps, so expired entries can be anywhere
+        stale = [key for key, (ts, _value) in self._store.items() if self._is_expired(ts, now)]
+        for key in stale:
+            del self._store[key]
+        return len(stale)
+
+    async def sweep(self, interval_seconds: float = 60.0) -> None:
+        """Run purge_expired() every `interval_seconds` until cancelled (app lifespan task)."""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            async with self._lock:
+                self.purge_expired()
+
+    def snapshot(self, prefix: str) -> list[tuple[str, float, Any]]:
+        """
+        Live entries whose key starts with `prefix` as (key, age_seconds, value), LRU order.
+        - lock-free: only for startup/shutdown when no requests are in flight
+        """
+        now = time.monotonic()
+        return [
+            (key, now - ts, value)
+            for key, (ts, value) in self._store.items()
+            if key.startswith(prefix) and not self._is_expired(ts, now)
+        ]
+
+    def restore(self, entries: list[tuple[str, float, Any]]) -> int:
+        """Re-insert snapshot entries keeping their remaining TTL; returns how many were loaded."""
+        now = time.monotonic()
+        loaded = 0
+        # entries are in LRU order: anything before the last maxsize would be evicted anyway
+        for key, age, value in entries[max(0, len(entries) - self.maxsize):]:
+            if age < self.ttl:
+                self._store[key] = (now - age, value)
+                self._store.move_to_end(key)
+                loaded += 1
+        for _ in range(len(self._store) - self.maxsize):
+            self._store.popitem(last=False)
+        return loaded
+
+    def stats(self) -> dict[str, Any]:
+        """Per-stage hit/miss counts since process start, for tuning TTL/size per stage."""
+        stages = {}
+        for stage in sorted(self._hits.keys() | self._misses.keys()):
+            hits, misses = self._hits[stage], self._misses[stage]
+            stages[stage] = {"hits": hits, "misses": misses, "hit_rate": round(hits / (hits + misses), 4)}
+        return {"size": len(self._store), "maxsize": self.maxsize, "stages": stages}
+
+    async def single_flight(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `compute` once per key at a time; concurrent callers get the same result or exception.
+        - a cancelled caller only cancels itself: if it was running `compute`, the
+          first waiter re-runs it and the others wait on that one
+        - does not read or write the cache itself (compute usually ends with set())
+        """
+        while (fut := self._inflight.get(key)) is not None:
+            try:
+                # shield: a cancelled waiter must not cancel the shared computation
+                return await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                # The leader was cancelled (e.g. its client disconnected), not us:
+                # take over the computation instead of failing a healthy request
+                task = asyncio.current_task()
+                if not fut.cancelled() or (task is not None and task.cancelling()):
+                    raise
+        fut = asyncio.get_running_loop().create_future()
+        # mark the exception as retrieved even when nobody else is waiting
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = fut
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
     async def get_or_set(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
         cached = await self.get(key)
         if cached is not None:
             return cached
-        value = await compute()
-        await self.set(key, value)
-        return value
+
+        async def _compute_and_set() -> Any:
+            value = await compute()
+            await self.set(key, value)
+            return value
+
+        return await self.single_flight(key, _compute_and_set)
 
 
 # Default shared cache instance for the app process
 shared_cache = TTLCache(maxsize=512, ttl_seconds=20 * 60)
+
+# Batch API pending markers and results (batch.py). Separate from shared_cache so
+# a bulk submit never evicts interactive entries, and kept for the 24h completion
+# window plus an hour to fetch and reuse the results
+batch_cache = TTLCache(maxsize=50_000, ttl_seconds=25 * 60 * 60)
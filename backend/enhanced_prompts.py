@@ -2,6 +2,8 @@
 Enhanced prompts with domain-specific templates following 2024 LLM best practices.
 Implements structured output optimization and contextual prompt engineering.
 """
+import re
+import sys
 from typing import Dict, Optional
 from enum import Enum
 
@@ -303,12 +305,13 @@ Provide comprehensive analysis with actionable development recommendations."""
     def __init__(self):
         self.category_keywords = {
             JobCategory.SOFTWARE_ENGINEERING: [
-                "software", "developer", "engineer", "programming", "backend", "frontend",
-                "fullstack", "devops", "api", "microservices", "architect", "technical lead"
+                "software", "developer", "engineer", "engineering", "programmer", "programming",
+                "backend", "frontend", "fullstack", "devops", "api", "microservices", "architect",
+                "architecture", "technical lead"
             ],
             JobCategory.DATA_SCIENCE: [
-                "data scientist", "machine learning", "ml", "ai", "analytics", "data analyst",
-                "data engineer", "statistician", "research scientist", "ml engineer"
+                "data scientist", "machine learning", "ml", "mlops", "ai", "analytics", "data analyst",
+                "data engineer", "data engineering", "statistician", "research scientist", "ml engineer"
             ],
             JobCategory.PRODUCT_MANAGEMENT: [
                 "product manager", "product owner", "product lead", "product director",
@@ -323,6 +326,21 @@ Provide comprehensive analysis with actionable development recommendations."""
                 "campaign", "seo", "social media", "marketing manager"
             ]
         }
+        # Whole-word check per keyword (simple plurals allowed: "APIs", "engineers"),
+        # so e.g. "ai" does not match inside "email" or "ml" inside "html". Other
+        # derived forms ("engineering", "architecture") are listed as keywords.
+        self._keyword_patterns = {
+            keyword: re.compile(r"\b" + re.escape(keyword) + r"(?:e?s)?\b")
+            for keywords in self.category_keywords.values()
+            for keyword in keywords
+        }
+        # Every (kind, category) prompt is assembled once; the getters only detect
+        # the category. Interned, so all callers share one object per prompt.
+        self._assembled: Dict[tuple[str, JobCategory], str] = {
+            (kind, category): sys.intern(self._assemble(kind, category))
+            for kind in ('job', 'cv', 'score', 'cvscore')
+            for category in JobCategory
+        }
 
     def detect_job_category(self, job_text: str) -> JobCategory:
         """
@@ -339,44 +357,58 @@ Provide comprehensive analysis with actionable development recommendations."""
             
         text_lower = job_text.lower()
         
-        # Score each category
-        category_scores = {}
+        # Score each category, keeping the running best; strict '>' keeps the first
+        # category on ties, and DEFAULT when nothing matches
+        best_category, best_score = JobCategory.DEFAULT, 0
+        patterns = self._keyword_patterns
         for category, keywords in self.category_keywords.items():
-            score = sum(1 for keyword in keywords if keyword in text_lower)
-            if score > 0:
-                category_scores[category] = score
-        
-        if not category_scores:
-            return JobCategory.DEFAULT
-            
-        return max(category_scores, key=category_scores.get)
+            score = 0
+            for keyword in keywords:
+                # find() is a cheap prefilter; the regex only runs from the first hit on
+                pos = text_lower.find(keyword)
+                if pos >= 0 and patterns[keyword].search(text_lower, pos):
+                    score += 1
+            if score > best_score:
+                best_category, best_score = category, score
+        return best_category
+
+    def _assemble(self, kind: str, category: JobCategory) -> str:
+        """Build the full system prompt of one kind ('job', 'cv', 'score', 'cvscore') for a category."""
+        system_prompt = self.BASE_SYSTEM_PROMPT.format(domain=category.value.replace('_', ' '))
+        if kind == 'job':
+            domain_prompt = self.JOB_ANALYSIS_PROMPTS.get(category, self.JOB_ANALYSIS_PROMPTS[JobCategory.DEFAULT])
+        elif kind == 'cv':
+            domain_prompt = self.CV_ANALYSIS_PROMPTS.get(category, self.CV_ANALYSIS_PROMPTS[JobCategory.DEFAULT])
+        elif kind == 'score':
+            domain_prompt = self.SCORING_PROMPTS.get(category, self.SCORING_PROMPTS[JobCategory.DEFAULT])
+        else:
+            cv_prompt = self.CV_ANALYSIS_PROMPTS.get(category, self.CV_ANALYSIS_PROMPTS[JobCategory.DEFAULT])
+            scoring_prompt = self.SCORING_PROMPTS.get(category, self.SCORING_PROMPTS[JobCategory.DEFAULT])
+            return (
+                f"{system_prompt}\n\n"
+                "You perform two tasks in one response: analyze the CV, then score it against the given job requirements.\n"
+                "Fill the CV analysis fields first; base `match_score` on that analysis and the job requirements JSON.\n\n"
+                f"CV ANALYSIS:\n{cv_prompt}\n\n"
+                f"MATCH SCORING (`match_score`):\n{scoring_prompt}"
+            )
+        return f"{system_prompt}\n\n{domain_prompt}"
 
     def get_job_analysis_prompt(self, job_text: str) -> str:
         """Get domain-specific job analysis prompt."""
-        category = self.detect_job_category(job_text)
-        domain_prompt = self.JOB_ANALYSIS_PROMPTS.get(category, self.JOB_ANALYSIS_PROMPTS[JobCategory.DEFAULT])
-        
-        system_prompt = self.BASE_SYSTEM_PROMPT.format(domain=category.value.replace('_', ' '))
-        return f"{system_prompt}\n\n{domain_prompt}"
+        return self._assembled[('job', self.detect_job_category(job_text))]
 
     def get_cv_analysis_prompt(self, job_context: Optional[str] = None) -> str:
         """Get domain-specific CV analysis prompt."""
-        if job_context:
-            category = self.detect_job_category(job_context)
-        else:
-            category = JobCategory.DEFAULT
-            
-        domain_prompt = self.CV_ANALYSIS_PROMPTS.get(category, self.CV_ANALYSIS_PROMPTS[JobCategory.DEFAULT])
-        system_prompt = self.BASE_SYSTEM_PROMPT.format(domain=category.value.replace('_', ' '))
-        return f"{system_prompt}\n\n{domain_prompt}"
+        category = self.detect_job_category(job_context) if job_context else JobCategory.DEFAULT
+        return self._assembled[('cv', category)]
 
     def get_scoring_prompt(self, job_text: str) -> str:
         """Get domain-specific scoring prompt."""
-        category = self.detect_job_category(job_text)
-        domain_prompt = self.SCORING_PROMPTS.get(category, self.SCORING_PROMPTS[JobCategory.DEFAULT])
-        
-        system_prompt = self.BASE_SYSTEM_PROMPT.format(domain=category.value.replace('_', ' '))
-        return f"{system_prompt}\n\n{domain_prompt}"
+        return self._assembled[('score', self.detect_job_category(job_text))]
+
+    def get_cv_and_scoring_prompt(self, job_text: str) -> str:
+        """Get a merged CV analysis + scoring prompt for single-call analysis."""
+        return self._assembled[('cvscore', self.detect_job_category(job_text))]
 
 # Global instance
 enhanced_prompts = EnhancedPromptTemplates()
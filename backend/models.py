@@ -1,15 +1,17 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional
 
 class SkillSet(BaseModel):
     technical: List[str] = Field(default_factory=list, description="Technical skills")
     soft: List[str] = Field(default_factory=list, description="Soft skills")
+    model_config = ConfigDict(frozen=True)
 
 class ExperienceDetails(BaseModel):
     minimum_years: Optional[int] = Field(None, description="Minimum years of experience required")
     industry: Optional[str] = Field(None, description="Relevant industry experience")
     type: Optional[str] = Field(None, description="Type of experience (e.g., full-time, internship)")
     leadership: Optional[str] = Field(None, description="Leadership experience required")
+    model_config = ConfigDict(frozen=True)
 
 class JobRequirements(BaseModel):
     """Structured job requirements extracted from a job posting."""
@@ -19,7 +21,7 @@ class JobRequirements(BaseModel):
     responsibilities: List[str] = Field(default_factory=list, description="Key responsibilities")
     languages: List[str] = Field(default_factory=list, description="Languages required")
     seniority_level: Optional[str] = Field(None, description="Seniority level (e.g., junior, senior, lead)")
-    model_config = {'strict': True}
+    model_config = ConfigDict(strict=True, frozen=True)
 
 class CVKeyInfo(BaseModel):
     experience_summary: str = Field(..., description="Summary of relevant experience")
@@ -28,24 +30,27 @@ class CVKeyInfo(BaseModel):
     certifications: List[str] = Field(default_factory=list)
     languages: List[str] = Field(default_factory=list)
     responsibilities: List[str] = Field(default_factory=list)
+    model_config = ConfigDict(frozen=True)
 
 class CandidateAssessment(BaseModel):
     overall_fit_score: int = Field(..., ge=1, le=10)
     justification: str
     strengths: List[str] = Field(default_factory=list)
     gaps: List[str] = Field(default_factory=list)
+    model_config = ConfigDict(frozen=True)
 
 class StrategicRecommendations(BaseModel):
     tailoring: List[str] = Field(default_factory=list)
     interview_focus: List[str] = Field(default_factory=list)
     career_development: List[str] = Field(default_factory=list)
+    model_config = ConfigDict(frozen=True)
 
 class CVAnalysis(BaseModel):
     """Detailed CV analysis."""
     candidate_suitability: CandidateAssessment
     key_information: CVKeyInfo
     recommendations: StrategicRecommendations
-    model_config = {'strict': True}
+    model_config = ConfigDict(strict=True, frozen=True)
 
 class MatchingScore(BaseModel):
     """Detailed matching score between a CV and job requirements."""
@@ -63,4 +68,13 @@ class MatchingScore(BaseModel):
     strengths: List[str] = Field(default_factory=list, description="Key strengths identified in the CV")
     gaps: List[str] = Field(default_factory=list, description="Key areas for improvement or missing requirements")
     # Be strict on types but ignore unknown extra fields for backward compatibility across versions
-    model_config = {'strict': True, 'extra': 'ignore'}
\ No newline at end of file
+    model_config = ConfigDict(strict=True, frozen=True, extra='ignore')
+
+class CVAnalysisWithScore(CVAnalysis):
+    """CV analysis and its match score against a job, produced in a single LLM call."""
+    match_score: MatchingScore
+
+    def split(self) -> tuple[CVAnalysis, MatchingScore]:
+        data = self.model_dump()
+        match_score = data.pop("match_score")
+        return CVAnalysis(**data), MatchingScore(**match_score)
@@ -0,0 +1,82 @@
+"""
+Local PDF text extraction used as a pre-pass before CV analysis.
+
+Text-native PDFs (the common case) are sent to the LLM as plain text, which is
+far cheaper and faster than the document/vision path used for raw PDF bytes.
+Image-only scans yield little or no text and fall back to sending the PDF.
+
+Uses pypdf (BSD licensed, pure Python) rather than PyMuPDF, whose AGPL
+license does not fit this project. Being pure Python it holds the GIL, so
+extraction runs in a process pool (PDF_EXTRACT_WORKERS, default one per
+core; 0 = a worker thread) and concurrent uploads parse on separate cores.
+"""
+import asyncio
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import logfire
+from pypdf import PdfReader
+
+# With less stripped text than this the PDF is treated as a scan
+MIN_TEXT_CHARS = 200
+
+try:
+    PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS") or os.cpu_count() or 1)
+except ValueError:
+    PDF_EXTRACT_WORKERS = os.cpu_count() or 1
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def extract_text(pdf_bytes: bytes) -> str:
+    """Return the concatenated page text, or "" if the PDF cannot be parsed."""
+    try:
+        reader = PdfReader(io.BytesIO(pdf_bytes))
+        return "\n".join(page.extract_text() or "" for page in reader.pages)
+    except Exception as e:
+        logfire.warn(f"PDF text extraction failed, falling back to binary: {e}")
+        return ""
+
+
+def usable_text(pdf_bytes: bytes) -> str | None:
+    """Extracted text if it is substantial enough to replace the PDF, else None."""
+    text = extract_text(pdf_bytes).strip()
+    return text if len(text) >= MIN_TEXT_CHARS else None
+
+
+def start_pool() -> None:
+    """Create the extraction process pool (app startup); workers spawn on first use."""
+    global _pool
+    if _pool is None and PDF_EXTRACT_WORKERS > 0:
+        # spawn: never fork a process that is running an event loop and threads
+        _pool = ProcessPoolExecutor(
+            max_workers=PDF_EXTRACT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def ausable_text(pdf_bytes: bytes) -> str | None:
+    """usable_text() off the event loop: in the process pool if started, else a thread."""
+    global _pool
+    pool = _pool
+    if pool is None:
+        return await asyncio.to_thread(usable_text, pdf_bytes)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, usable_text, pdf_bytes)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed on a pathological PDF); replace the pool
+        logfire.warn("PDF extraction pool broken, restarting it")
+        if _pool is pool:
+            _pool = None
+            start_pool()
+        return await asyncio.to_thread(usable_text, pdf_bytes)
@@ -0,0 +1,201 @@
+"""
+Semantic (embedding) cache for near-duplicate vacancy texts.
+
+The exact cache keys on a hash of vacancy_text, so a reposted vacancy with a
+trivial edit is a full miss. This cache embeds the normalized text and
+returns a stored result when the nearest neighbour's cosine similarity is
+at or above the threshold.
+
+- in-process only (same scope as `shared_cache`), TTL + LRU bounded
+- vectors are L2-normalized on insert so cosine is a plain dot product
+- entries are namespaced (agent version/provider/model) so results from a
+  different model or prompt version are never reused
+- opt-in via SEMANTIC_CACHE=true because each lookup costs one embeddings call
+- SEMANTIC_CACHE_BACKEND=local embeds in-process with sentence-transformers
+  (optional dependency, `pip install .[local-embeddings]`) instead of calling
+  the OpenAI embeddings API; MiniLM similarities run lower, hence its default
+  threshold of 0.87
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import operator
+import os
+import time
+from collections import OrderedDict
+from contextlib import AbstractAsyncContextManager, nullcontext
+from typing import Any, Optional
+
+import blake3
+import logfire
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE", "false").lower() in {"1", "true", "yes"}
+SEMANTIC_CACHE_BACKEND = os.getenv("SEMANTIC_CACHE_BACKEND", "openai").lower()
+_LOCAL_BACKEND = SEMANTIC_CACHE_BACKEND == "local"
+# empty counts as unset so compose can pass the variable through without pinning a default
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD") or ("0.87" if _LOCAL_BACKEND else "0.97"))
+EMBEDDING_MODEL = os.getenv("SEMANTIC_CACHE_EMBEDDING_MODEL", "text-embedding-3-small")
+# text-embedding-3 models support shortened vectors; 256 dims keeps the linear scan cheap
+EMBEDDING_DIMENSIONS = int(os.getenv("SEMANTIC_CACHE_DIMENSIONS", "256"))
+LOCAL_EMBEDDING_MODEL = os.getenv("SEMANTIC_CACHE_LOCAL_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+
+# Identifies the vector space; part of the namespace so vectors from different
+# embedding models are never compared
+EMBEDDING_ID = f"local:{LOCAL_EMBEDDING_MODEL}" if _LOCAL_BACKEND else f"{EMBEDDING_MODEL}:{EMBEDDING_DIMENSIONS}"
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and collapse whitespace so formatting-only edits embed identically."""
+    return " ".join(text.lower().split())
+
+
+def _unit(vector: list[float]) -> list[float]:
+    norm = math.sqrt(sum(x * x for x in vector))
+    if norm == 0:
+        return vector
+    return [x / norm for x in vector]
+
+
+def _nearest(query: list[float], candidates: list[tuple[Any, list[float]]]) -> tuple[Any, float]:
+    """(key, cosine) of the candidate closest to `query`; vectors are unit length."""
+    best_key = None
+    best_score = -1.0
+    for key, vec in candidates:
+        score = sum(map(operator.mul, query, vec))
+        if score > best_score:
+            best_key, best_score = key, score
+    return best_key, best_score
+
+
+# Pure-Python dot products cost ~7us each at 256 dims; namespaces larger than
+# this are scanned in a worker thread instead of stalling the event loop
+_SCAN_INLINE_MAX = 32
+
+
+class SemanticCache:
+    """
+    In-memory nearest-neighbour cache with TTL and LRU eviction.
+    - async safe: writes take one asyncio.Lock; lookups are lock-free
+    - linear scan per namespace (sized for a few hundred entries), off the
+      event loop once a namespace holds more than _SCAN_INLINE_MAX entries
+    """
+
+    def __init__(self, maxsize: int = 512, ttl_seconds: int = 900, threshold: float = 0.97):
+        self.maxsize = maxsize
+        self.ttl = ttl_seconds
+        self.threshold = threshold
+        self._store: OrderedDict[tuple[str, str], tuple[float, list[float], Any]] = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    def _is_expired(self, ts: float, now: float) -> bool:
+        return (now - ts) > self.ttl
+
+    async def lookup(self, namespace: str, vector: list[float]) -> Optional[Any]:
+        """Return the value of the most similar entry in `namespace` if it meets the threshold."""
+        query = _unit(vector)
+        # Collect candidates without awaiting, so no write interleaves; expired
+        # entries are dropped on the way
+        now = time.monotonic()
+        candidates = []
+        for key, (ts, vec, _value) in list(self._store.items()):
+            if self._is_expired(ts, now):
+                del self._store[key]
+            elif key[0] == namespace:
+                candidates.append((key, vec))
+        if not candidates:
+            return None
+        if len(candidates) > _SCAN_INLINE_MAX:
+            best_key, best_score = await asyncio.to_thread(_nearest, query, candidates)
+        else:
+            best_key, best_score = _nearest(query, candidates)
+        if best_score < self.threshold:
+            return None
+        item = self._store.get(best_key)
+        if item is None:
+            # evicted while the scan ran in the thread
+            return None
+        self._store.move_to_end(best_key)
+        logfire.info("semantic cache hit", namespace=namespace, similarity=round(best_score, 4))
+        return item[2]
+
+    async def add(self, namespace: str, entry_id: str, vector: list[float], value: Any) -> None:
+        async with self._lock:
+            key = (namespace, entry_id)
+            if key in self._store:
+                self._store.move_to_end(key)
+            self._store[key] = (time.monotonic(), _unit(vector), value)
+            if len(self._store) > self.maxsize:
+                self._store.popitem(last=False)
+
+
+_local_model = None
+
+
+def _load_local_model():
+    # Loaded once and kept for the process lifetime (~90 MB for MiniLM)
+    global _local_model
+    if _local_model is None:
+        from sentence_transformers import SentenceTransformer
+
+        _local_model = SentenceTransformer(LOCAL_EMBEDDING_MODEL)
+    return _local_model
+
+
+def _encode_local(text: str) -> list[float]:
+    return _load_local_model().encode(text, normalize_embeddings=True).tolist()
+
+
+def preload() -> None:
+    """Load the local embedding model ahead of the first request (no-op unless enabled + local)."""
+    if not (SEMANTIC_CACHE_ENABLED and _LOCAL_BACKEND):
+        return
+    try:
+        _load_local_model()
+    except Exception as e:
+        logfire.warn(f"semantic cache local model preload failed: {e}")
+
+
+# Embeddings do not depend on the LLM model or API key, so the same vacancy
+# analyzed with another X-LLM-Model (or after its result expired) reuses the
+# vector. Keyed by a digest of the normalized text; LRU bounded.
+_EMBEDDING_MEMO_SIZE = 1024
+_embedding_memo: OrderedDict[str, list[float]] = OrderedDict()
+
+
+async def embed(client, text: str, slot: AbstractAsyncContextManager = nullcontext()) -> Optional[list[float]]:
+    """
+    Embed normalized text; returns None on failure so callers fall back to the LLM.
+    - `slot` is held around the embeddings API call (agents passes the API key's
+      LLM_MAX_CONCURRENCY semaphore); local inference does not take it
+    """
+    normalized = normalize_text(text)
+    memo_key = blake3.blake3(normalized.encode("utf-8")).hexdigest()
+    vector = _embedding_memo.get(memo_key)
+    if vector is not None:
+        _embedding_memo.move_to_end(memo_key)
+        return vector
+    try:
+        if _LOCAL_BACKEND:
+            # CPU-bound model inference; keep it off the event loop
+            vector = await asyncio.to_thread(_encode_local, normalized)
+        else:
+            async with slot:
+                resp = await client.embeddings.create(
+                    model=EMBEDDING_MODEL,
+                    input=normalized,
+                    dimensions=EMBEDDING_DIMENSIONS,
+                )
+            vector = list(resp.data[0].embedding)
+    except Exception as e:
+        logfire.warn(f"semantic cache embedding failed: {e}")
+        return None
+    _embedding_memo[memo_key] = vector
+    if len(_embedding_memo) > _EMBEDDING_MEMO_SIZE:
+        _embedding_memo.popitem(last=False)
+    return vector
+
+
+# Default semantic cache instance for the app process (same TTL as shared_cache)
+semantic_cache = SemanticCache(maxsize=512, ttl_seconds=20 * 60, threshold=SEMANTIC_CACHE_THRESHOLD)
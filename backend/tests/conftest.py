@@ -0,0 +1,49 @@
+import os
+
+# Before any app module is imported: no telemetry export, no agent prewarm
+os.environ.setdefault("LOGFIRE_SEND_TO_LOGFIRE", "false")
+os.environ.setdefault("PREWARM", "0")
+
+import pytest
+
+from cache_utils import batch_cache, shared_cache
+from semantic_cache import semantic_cache
+from models import CVAnalysis, JobRequirements, MatchingScore
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    for cache in (shared_cache, batch_cache, semantic_cache):
+        cache._store.clear()
+    yield
+    for cache in (shared_cache, batch_cache, semantic_cache):
+        cache._store.clear()
+
+
+@pytest.fixture
+def job() -> JobRequirements:
+    return JobRequirements(
+        required_skills={"technical": ["Python"], "soft": ["Communication"]},
+        responsibilities=["Develop APIs"],
+    )
+
+
+@pytest.fixture
+def cv() -> CVAnalysis:
+    return CVAnalysis(
+        candidate_suitability={"overall_fit_score": 7, "justification": "ok"},
+        key_information={"experience_summary": "x", "technical_skills": ["python"], "soft_skills": [], "languages": []},
+        recommendations={},
+    )
+
+
+def make_score(overall: int = 50, **fields) -> MatchingScore:
+    values = {
+        "overall_match_score": overall, "overall_explanation": f"overall {overall}",
+        "technical_skills_score": overall, "technical_skills_explanation": "t",
+        "soft_skills_score": overall, "soft_skills_explanation": "s",
+        "experience_score": overall, "experience_explanation": "e",
+        "key_responsibilities_score": overall, "key_responsibilities_explanation": "r",
+    }
+    values.update(fields)
+    return MatchingScore(**values)
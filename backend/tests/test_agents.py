@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+import agents
+
+
+def test_analyze_and_score_failure_cancels_the_sibling(monkeypatch):
+    cv_state = {}
+
+    async def failing_job(*args, **kwargs):
+        await asyncio.sleep(0)
+        raise ValueError("job analysis failed")
+
+    async def slow_cv(*args, **kwargs):
+        cv_state["started"] = True
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cv_state["cancelled"] = True
+            raise
+
+    monkeypatch.setattr(agents, "analyze_job_vacancy", failing_job)
+    monkeypatch.setattr(agents, "analyze_cv", slow_cv)
+
+    async def main():
+        return await asyncio.wait_for(agents.analyze_and_score("Python dev", b"%PDF-"), timeout=1)
+
+    # the original exception, not an ExceptionGroup and not a timeout
+    with pytest.raises(ValueError, match="job analysis failed"):
+        asyncio.run(main())
+    assert cv_state == {"started": True, "cancelled": True}
+
+
+def test_analyze_and_score_scores_both_results(monkeypatch, job, cv):
+    async def analyze_job(*args, **kwargs):
+        return job
+
+    async def analyze_cv(*args, **kwargs):
+        return cv
+
+    async def score(cv_analysis, job_requirements, **kwargs):
+        return (cv_analysis, job_requirements)
+
+    monkeypatch.setattr(agents, "analyze_job_vacancy", analyze_job)
+    monkeypatch.setattr(agents, "analyze_cv", analyze_cv)
+    monkeypatch.setattr(agents, "score_cv_match", score)
+    assert asyncio.run(agents.analyze_and_score("Python dev", b"%PDF-")) == (job, cv, (cv, job))
+
+
+def test_embeddings_hold_the_keys_llm_slot(monkeypatch, job):
+    import types
+
+    import semantic_cache
+
+    free_slots = []
+
+    async def create(**kwargs):
+        free_slots.append(agents._llm_slot("sk-test")._value)
+        return types.SimpleNamespace(data=[types.SimpleNamespace(embedding=[1.0, 0.0])])
+
+    async def run_job_agent(*args):
+        return job
+
+    client = types.SimpleNamespace(embeddings=types.SimpleNamespace(create=create))
+    monkeypatch.setattr(semantic_cache, "SEMANTIC_CACHE_ENABLED", True)
+    monkeypatch.setattr(semantic_cache, "_embedding_memo", type(semantic_cache._embedding_memo)())
+    monkeypatch.setattr(agents, "get_openai_client", lambda api_key=None: client)
+    monkeypatch.setattr(agents, "_run_job_agent", run_job_agent)
+
+    assert asyncio.run(agents.analyze_job_vacancy("Embedded vacancy", api_key="sk-test")) is job
+    assert free_slots == [agents.LLM_MAX_CONCURRENCY - 1]
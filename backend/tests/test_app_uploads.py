@@ -0,0 +1,75 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import app as appmod
+
+KEY = {"X-OpenAI-Key": "sk-test"}
+MULTIPART = {"content-type": "multipart/form-data; boundary=abc"}
+
+
+@pytest.fixture
+def client():
+    return TestClient(appmod.app)
+
+
+def _part(headers: str, body: bytes = b"x") -> bytes:
+    return b"--abc\r\n" + headers.encode() + b"\r\n\r\n" + body + b"\r\n"
+
+
+MALFORMED = {
+    "missing boundary": ({"content-type": "multipart/form-data"}, b"x"),
+    "part without name": (MULTIPART, _part("Content-Disposition: form-data")),
+    "too many files": (MULTIPART, (
+        _part('Content-Disposition: form-data; name="file"; filename="a.pdf"')
+        + _part('Content-Disposition: form-data; name="file"; filename="b.pdf"')
+        + b"--abc--\r\n"
+    )),
+}
+
+
+@pytest.mark.parametrize("path", ["/analyze-cv", "/analyze-and-score"])
+@pytest.mark.parametrize("headers,body", MALFORMED.values(), ids=MALFORMED.keys())
+def test_malformed_multipart_is_400(client, path, headers, body):
+    r = client.post(path, headers={**KEY, **headers}, content=body)
+    assert r.status_code == 400
+    assert not r.json()["detail"].startswith("Error processing")
+
+
+def test_large_upload_stays_in_memory(client, monkeypatch):
+    seen = {}
+    read_upload = appmod._read_upload
+
+    async def spy(file):
+        seen["rolled"] = file.file._rolled
+        return await read_upload(file)
+
+    monkeypatch.setattr(appmod, "_read_upload", spy)
+    monkeypatch.setattr(appmod.agents, "analyze_cv", lambda contents, **kwargs: seen.setdefault("size", len(contents)))
+    monkeypatch.setattr(appmod, "_model_response", lambda result: {"size": result})
+    pdf = b"%PDF-" + b"x" * (3 * 1024 * 1024)
+    r = client.post("/analyze-cv", headers=KEY, files={"file": ("cv.pdf", pdf, "application/pdf")})
+    assert r.status_code == 200
+    assert seen == {"rolled": False, "size": len(pdf)}
+    # the spool threshold is raised for the upload parser only, not process-wide
+    assert appmod.MultiPartParser.spool_max_size == 1024 * 1024
+
+
+def _chunks(total: int, size: int = 64 * 1024):
+    yield _part('Content-Disposition: form-data; name="file"; filename="cv.pdf"', b"")[:-2]
+    for _ in range(total // size + 1):
+        yield b"x" * size
+
+
+@pytest.mark.parametrize("path", ["/analyze-cv", "/analyze-and-score"])
+def test_chunked_upload_over_limit_is_413(client, monkeypatch, path):
+    monkeypatch.setattr(appmod, "MAX_UPLOAD_BYTES", 256 * 1024)
+    # a generator body is sent chunked, without Content-Length
+    r = client.post(path, headers={**KEY, **MULTIPART}, content=_chunks(appmod.MAX_UPLOAD_BYTES))
+    assert r.status_code == 413
+    assert r.json()["detail"] == f"File too large. Max {appmod.MAX_UPLOAD_MB}MB"
+
+
+def test_declared_content_length_over_limit_is_413(client, monkeypatch):
+    monkeypatch.setattr(appmod, "MAX_UPLOAD_BYTES", 1024)
+    r = client.post("/analyze-cv", headers=KEY, files={"file": ("cv.pdf", b"x" * 2048, "application/pdf")})
+    assert r.status_code == 413
@@ -0,0 +1,107 @@
+import asyncio
+import types
+
+import orjson
+import pytest
+
+import agents
+import batch
+from cache_utils import batch_cache
+
+
+class FakeClient:
+    """files/batches stand-in: records submitted lines, answers retrieve() with `status`."""
+
+    def __init__(self, status="completed", output=None):
+        self.status = status
+        self.output = output  # custom_id -> message content (or None for an errored line)
+        self.submitted: list[list[dict]] = []
+        self.files = types.SimpleNamespace(create=self._create_file, content=self._content)
+        self.batches = types.SimpleNamespace(create=self._create_batch, retrieve=self._retrieve)
+
+    def with_options(self, **kwargs):
+        return self
+
+    async def _create_file(self, file, purpose):
+        self.submitted.append([orjson.loads(raw) for raw in file[1].getvalue().splitlines()])
+        return types.SimpleNamespace(id=f"file-{len(self.submitted)}")
+
+    async def _create_batch(self, **kwargs):
+        return types.SimpleNamespace(id=f"batch-{len(self.submitted)}", status="validating")
+
+    async def _retrieve(self, batch_id):
+        has_output = self.output is not None
+        return types.SimpleNamespace(
+            id=batch_id, status=self.status, request_counts=None,
+            output_file_id="out" if has_output else None, error_file_id=None,
+        )
+
+    async def _content(self, file_id):
+        lines = []
+        for custom_id, content in self.output.items():
+            if content is None:
+                lines.append({"custom_id": custom_id, "error": {"message": "boom"}})
+            else:
+                body = {"choices": [{"message": {"content": content}}]}
+                lines.append({"custom_id": custom_id, "response": {"status_code": 200, "body": body}})
+        return types.SimpleNamespace(text="\n".join(orjson.dumps(line).decode() for line in lines))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    fake = FakeClient()
+    monkeypatch.setattr(agents, "get_openai_client", lambda api_key=None: fake)
+    return fake
+
+
+def _submit(vacancies):
+    return asyncio.run(batch.submit_batch(vacancies, [], api_key="sk-test"))
+
+
+def test_request_line_uses_strict_schema(client):
+    _submit(["Python dev"])
+    json_schema = client.submitted[0][0]["body"]["response_format"]["json_schema"]
+    assert json_schema["strict"] is True
+    assert json_schema["schema"]["additionalProperties"] is False
+
+
+def test_resubmit_while_pending_is_not_sent_again(client):
+    first = _submit(["Python dev"])
+    second = _submit(["Python dev"])
+    assert second["batch_id"] is None
+    assert second["pending"] == {first["submitted"][0]: first["batch_id"]}
+
+
+@pytest.mark.parametrize("status", ["failed", "expired", "cancelled"])
+def test_resubmit_after_dead_batch(client, status):
+    first = _submit(["Python dev"])
+    client.status = status
+    out = asyncio.run(batch.get_batch_results(first["batch_id"], api_key="sk-test"))
+    assert out["results"] == {}
+
+    again = _submit(["Python dev"])
+    assert again["submitted"] == first["submitted"]
+    assert again["batch_id"] != first["batch_id"]
+
+
+def test_resubmit_after_errored_line(client, job):
+    first = _submit(["Python dev", "Go dev"])
+    ok_id, failed_id = first["submitted"]
+    client.output = {ok_id: job.model_dump_json(), failed_id: None}
+    out = asyncio.run(batch.get_batch_results(first["batch_id"], api_key="sk-test"))
+    assert list(out["results"]) == [ok_id]
+    assert list(out["errors"]) == [failed_id]
+
+    again = _submit(["Python dev", "Go dev"])
+    assert again["cached"] == [ok_id]
+    assert again["submitted"] == [failed_id]
+
+
+def test_dead_batch_keeps_markers_of_newer_batch(client):
+    first = _submit(["Python dev"])
+    custom_id = first["submitted"][0]
+    # The input was resubmitted elsewhere (e.g. after a restart) before this fetch
+    asyncio.run(batch_cache.set(batch._pending_key(custom_id), "batch-newer"))
+    client.status = "failed"
+    asyncio.run(batch.get_batch_results(first["batch_id"], api_key="sk-test"))
+    assert _submit(["Python dev"])["pending"] == {custom_id: "batch-newer"}
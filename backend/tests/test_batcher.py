@@ -0,0 +1,155 @@
+import asyncio
+import types
+
+import pytest
+
+import agents
+from batcher import Batcher
+
+
+class Recorder:
+    """run_batch stand-in: records each batch and echoes items (or raises `error`)."""
+
+    def __init__(self, error: Exception | None = None):
+        self.batches: list[tuple] = []
+        self.error = error
+
+    async def __call__(self, group, items):
+        self.batches.append((group, list(items)))
+        if self.error is not None:
+            raise self.error
+        return [f"{group}:{item}" for item in items]
+
+
+def test_flush_at_max_batch():
+    async def main():
+        run = Recorder()
+        # a wait this long would time the test out: only the size trigger can flush
+        batcher = Batcher(run, max_batch=3, max_wait_ms=60_000)
+        results = await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit("g", i) for i in range(3))), timeout=1,
+        )
+        assert results == ["g:0", "g:1", "g:2"]
+        assert run.batches == [("g", [0, 1, 2])]
+        assert not batcher._timers
+
+    asyncio.run(main())
+
+
+def test_flush_after_max_wait_per_group():
+    async def main():
+        run = Recorder()
+        batcher = Batcher(run, max_batch=16, max_wait_ms=10)
+        results = await asyncio.gather(
+            batcher.submit("a", 1), batcher.submit("b", 2), batcher.submit("a", 3),
+        )
+        assert results == ["a:1", "b:2", "a:3"]
+        assert sorted(run.batches) == [("a", [1, 3]), ("b", [2])]
+
+    asyncio.run(main())
+
+
+def test_run_batch_exception_reaches_every_waiter():
+    async def main():
+        error = RuntimeError("boom")
+        batcher = Batcher(Recorder(error), max_batch=2, max_wait_ms=10)
+        results = await asyncio.gather(
+            batcher.submit("g", 1), batcher.submit("g", 2), return_exceptions=True,
+        )
+        assert results == [error, error]
+
+    asyncio.run(main())
+
+
+def test_wrong_result_count_fails_every_waiter():
+    async def main():
+        async def short(group, items):
+            return items[:1]
+
+        batcher = Batcher(short, max_batch=2, max_wait_ms=10)
+        results = await asyncio.gather(
+            batcher.submit("g", 1), batcher.submit("g", 2), return_exceptions=True,
+        )
+        assert all(isinstance(r, ValueError) for r in results)
+
+    asyncio.run(main())
+
+
+class FakeAgent:
+    """Agent stand-in: run() returns `outputs(prompt)` as result.output and records the prompt."""
+
+    def __init__(self, outputs):
+        self.outputs = outputs
+        self.prompts: list[str] = []
+
+    async def run(self, prompt, model=None, model_settings=None):
+        self.prompts.append(prompt)
+        return types.SimpleNamespace(output=self.outputs(prompt))
+
+
+@pytest.fixture
+def fake_agents(monkeypatch):
+    fakes: dict[str, FakeAgent] = {}
+    monkeypatch.setattr(agents, "_get_agent", lambda task, system_prompt: fakes[task])
+    monkeypatch.setattr(agents, "_get_model", lambda provider, model, api_key: None)
+    return fakes
+
+
+def test_job_batch_wrong_length_falls_back_to_single_calls(fake_agents, job):
+    texts = ["Python dev", "Go dev", "Rust dev"]
+    per_text = {text: job.model_copy(update={"seniority_level": text}) for text in texts}
+    fake_agents["job_batch"] = FakeAgent(lambda prompt: [job])  # one object for three vacancies
+    fake_agents["job"] = FakeAgent(lambda prompt: per_text[prompt.removeprefix("Vacancy text:\n\n")])
+
+    group = ("sk-test", "openai", "gpt-4o", "system")
+    results = asyncio.run(agents._run_job_batch(group, texts))
+
+    assert [r.seniority_level for r in results] == texts
+    assert len(fake_agents["job_batch"].prompts) == 1
+    assert len(fake_agents["job"].prompts) == 3
+
+
+def _votes(outputs_per_call):
+    """score_batch outputs: one list per vote call, in call order."""
+    calls = iter(outputs_per_call)
+    return lambda prompt: next(calls)
+
+
+def test_score_batch_waiters_get_their_own_median(fake_agents):
+    from conftest import make_score
+
+    # three votes over two pairs: pair 0 -> 10/30/20, pair 1 -> 70/90/80
+    fake_agents["score_batch"] = FakeAgent(_votes([
+        [make_score(10), make_score(70)],
+        [make_score(30), make_score(90)],
+        [make_score(20), make_score(80)],
+    ]))
+
+    async def main():
+        batcher = Batcher(agents._run_score_batch, max_batch=2, max_wait_ms=10)
+        group = ("sk-test", "openai", "gpt-4o-mini", 3, "system", 10)
+        return await asyncio.gather(batcher.submit(group, b"pair-0"), batcher.submit(group, b"pair-1"))
+
+    first, second = asyncio.run(main())
+    assert first.overall_match_score == 20 and first.overall_explanation == "overall 20"
+    assert second.overall_match_score == 80 and second.technical_skills_score == 80
+    assert len(fake_agents["score_batch"].prompts) == 3
+
+
+def test_score_batch_wrong_length_falls_back_to_per_pair_calls(fake_agents):
+    from conftest import make_score
+
+    # the second vote drops a pair, so no vote's list can be trusted
+    fake_agents["score_batch"] = FakeAgent(_votes([
+        [make_score(10), make_score(70)],
+        [make_score(30)],
+        [make_score(20), make_score(80)],
+    ]))
+    per_pair = {"pair-0": 40, "pair-1": 60}
+    fake_agents["score"] = FakeAgent(lambda prompt: make_score(per_pair[prompt.rsplit(" ", 1)[1]]))
+
+    group = ("sk-test", "openai", "gpt-4o-mini", 3, "system", 10)
+    results = asyncio.run(agents._run_score_batch(group, [b"pair-0", b"pair-1"]))
+
+    assert [r.overall_match_score for r in results] == [40, 60]
+    assert len(fake_agents["score"].prompts) == 6  # three votes per pair
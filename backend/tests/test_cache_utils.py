@@ -0,0 +1,80 @@
+import asyncio
+
+from cache_utils import TTLCache
+
+
+def test_single_flight_leader_cancelled_waiter_recomputes():
+    async def main():
+        cache = TTLCache()
+        calls = 0
+        started = asyncio.Event()
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                started.set()
+                await asyncio.sleep(10)
+            return "value"
+
+        leader = asyncio.create_task(cache.single_flight("k", compute))
+        await started.wait()
+        waiter = asyncio.create_task(cache.single_flight("k", compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        assert await waiter == "value"
+        assert leader.cancelled()
+        assert calls == 2
+        assert not cache._inflight
+
+    asyncio.run(main())
+
+
+def test_single_flight_cancelled_waiter_keeps_computation():
+    async def main():
+        cache = TTLCache()
+        release = asyncio.Event()
+
+        async def compute():
+            await release.wait()
+            return "value"
+
+        leader = asyncio.create_task(cache.single_flight("k", compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.single_flight("k", compute))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await leader == "value"
+        assert waiter.cancelled()
+
+    asyncio.run(main())
+
+
+def test_get_or_set_leader_cancelled_waiter_gets_cached_value():
+    async def main():
+        cache = TTLCache()
+        calls = 0
+        started = asyncio.Event()
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                started.set()
+                await asyncio.sleep(10)
+            return {"n": calls}
+
+        leader = asyncio.create_task(cache.get_or_set("score:k", compute))
+        await started.wait()
+        waiter = asyncio.create_task(cache.get_or_set("score:k", compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        assert await waiter == {"n": 2}
+        assert await cache.get("score:k") == {"n": 2}
+
+    asyncio.run(main())
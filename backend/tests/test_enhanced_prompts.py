@@ -0,0 +1,34 @@
+import pytest
+
+from enhanced_prompts import JobCategory, enhanced_prompts
+
+SE, DS, PM = JobCategory.SOFTWARE_ENGINEERING, JobCategory.DATA_SCIENCE, JobCategory.PRODUCT_MANAGEMENT
+SALES, MARKETING, DEFAULT = JobCategory.SALES, JobCategory.MARKETING, JobCategory.DEFAULT
+
+
+@pytest.mark.parametrize("text,category", [
+    # keywords inside unrelated words are not matches
+    ("Respond to customer emails and handle the help desk", DEFAULT),
+    ("Office assistant, basic HTML knowledge for newsletters", DEFAULT),
+    ("Venture capital associate", DEFAULT),
+    # simple plurals match
+    ("We are hiring developers to build our APIs", SE),
+    ("Data scientists working on machine learning models", DS),
+    ("Product managers owning the roadmap", PM),
+    ("Account executives hitting their quotas", SALES),
+    ("Digital marketing manager for SEO campaigns", MARKETING),
+    # derived forms listed as their own keywords
+    ("Head of Engineering, lead our platform engineering team", SE),
+    ("Solutions Architecture lead for cloud architecture", SE),
+    ("Programmer wanted for embedded firmware", SE),
+    ("MLOps specialist for model deployment", DS),
+    ("Data Engineering: build analytics pipelines with Spark", DS),
+    ("", DEFAULT),
+])
+def test_detect_job_category(text, category):
+    assert enhanced_prompts.detect_job_category(text) is category
+
+
+def test_ties_go_to_the_first_category():
+    # one software and one data science keyword
+    assert enhanced_prompts.detect_job_category("backend analytics") is SE
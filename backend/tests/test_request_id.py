@@ -0,0 +1,28 @@
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as appmod
+
+GENERATED = re.compile(r"[0-9a-f]{32}")
+
+
+@pytest.fixture
+def client():
+    return TestClient(appmod.app)
+
+
+@pytest.mark.parametrize("request_id", ["abc", "req_01-XYZ", "a" * 128])
+def test_valid_client_id_is_echoed(client, request_id):
+    assert client.get("/healthz", headers={"X-Request-ID": request_id}).headers["x-request-id"] == request_id
+
+
+@pytest.mark.parametrize("request_id", ["", "a" * 129, "has space", "a,b", "<script>", "ünïcode", "id\tinjected"])
+def test_invalid_client_id_is_replaced(client, request_id):
+    echoed = client.get("/healthz", headers={"X-Request-ID": request_id.encode("utf-8")}).headers["x-request-id"]
+    assert GENERATED.fullmatch(echoed)
+
+
+def test_missing_id_is_generated(client):
+    assert GENERATED.fullmatch(client.get("/healthz").headers["x-request-id"])
@@ -0,0 +1,93 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+from pydantic_ai.exceptions import ModelHTTPError
+
+import agents
+
+_REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def _openai_error(cls, status: int, headers: dict[str, str] | None = None):
+    response = httpx.Response(status, headers=headers, request=_REQUEST)
+    return cls("error", response=response, body=None)
+
+
+def _model_http_error(status: int, headers: dict[str, str] | None = None) -> ModelHTTPError:
+    # pydantic-ai raises it `from` the OpenAI status error, which carries the headers
+    error = ModelHTTPError(status_code=status, model_name="gpt-4o", body=None)
+    error.__cause__ = _openai_error(openai.APIStatusError, status, headers)
+    return error
+
+
+@pytest.mark.parametrize("error,retryable", [
+    (asyncio.TimeoutError(), True),
+    (openai.APIConnectionError(request=_REQUEST), True),
+    (openai.APITimeoutError(request=_REQUEST), True),
+    (_openai_error(openai.RateLimitError, 429), True),
+    (_openai_error(openai.InternalServerError, 500), True),
+    (_openai_error(openai.BadRequestError, 400), False),
+    (_openai_error(openai.AuthenticationError, 401), False),
+    *((_model_http_error(status), True) for status in (408, 409, 429, 500, 502, 503, 504)),
+    *((_model_http_error(status), False) for status in (400, 401, 403, 404, 422)),
+    (ValueError("bad output"), False),
+])
+def test_is_retryable(error, retryable):
+    assert agents._is_retryable(error) is retryable
+
+
+@pytest.mark.parametrize("headers,expected", [
+    ({}, None),
+    ({"retry-after": "3"}, 3.0),
+    ({"retry-after": "1.5"}, 1.5),
+    ({"retry-after-ms": "250"}, 0.25),
+    ({"retry-after-ms": "250", "retry-after": "9"}, 0.25),   # ms header wins
+    ({"retry-after": "Wed, 21 Oct 2026 07:28:00 GMT"}, None),
+])
+def test_retry_after(headers, expected):
+    assert agents._retry_after(_openai_error(openai.RateLimitError, 429, headers)) == expected
+    # the headers of the wrapped OpenAI error are found too
+    assert agents._retry_after(_model_http_error(429, headers)) == expected
+
+
+def _run(errors, monkeypatch):
+    """_run_with_retries over a call that raises `errors` in turn, then succeeds; returns (result, calls, sleeps)."""
+    sleeps: list[float] = []
+    calls = 0
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        if calls <= len(errors):
+            raise errors[calls - 1]
+        return "ok"
+
+    monkeypatch.setattr(agents.asyncio, "sleep", fake_sleep)
+    try:
+        result = asyncio.run(agents._run_with_retries(call, timeout=5, api_key="sk-test"))
+    except Exception as e:
+        result = e
+    return result, calls, sleeps
+
+
+def test_retry_after_is_capped(monkeypatch):
+    result, calls, sleeps = _run([_model_http_error(429, {"retry-after": "120"})], monkeypatch)
+    assert (result, calls, sleeps) == ("ok", 2, [agents._MAX_RETRY_AFTER_SECONDS])
+
+
+def test_non_retryable_fails_on_first_attempt(monkeypatch):
+    error = _model_http_error(401)
+    result, calls, sleeps = _run([error], monkeypatch)
+    assert (result, calls, sleeps) == (error, 1, [])
+
+
+def test_retries_stop_after_the_last_attempt(monkeypatch):
+    errors = [_model_http_error(503) for _ in range(3)]
+    result, calls, sleeps = _run(errors, monkeypatch)
+    assert result is errors[-1]
+    assert calls == 3 and len(sleeps) == 2 and sleeps[0] < sleeps[1]
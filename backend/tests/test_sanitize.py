@@ -0,0 +1,122 @@
+import pytest
+
+from app import _first_list, _sanitize_cv, _sanitize_job
+
+
+def _job(technical=(), soft=(), responsibilities=(), languages=(), experience=None, seniority_level=None):
+    return {
+        "required_skills": {"technical": list(technical), "soft": list(soft)},
+        "experience": experience or {"minimum_years": None, "industry": None, "type": None, "leadership": None},
+        "responsibilities": list(responsibilities),
+        "languages": list(languages),
+        "seniority_level": seniority_level,
+    }
+
+
+EXPERIENCE = {"minimum_years": 3, "industry": "fintech", "type": "backend", "leadership": False}
+
+JOB_CASES = {
+    "empty": ({}, _job()),
+    "none": (None, _job()),
+    "canonical": (
+        {"required_skills": {"technical": ["Python"], "soft": ["Teamwork"]}, "responsibilities": ["Build APIs"],
+         "languages": ["English"], "experience": EXPERIENCE, "seniority_level": "senior"},
+        _job(["Python"], ["Teamwork"], ["Build APIs"], ["English"], EXPERIENCE, "senior"),
+    ),
+    "none values": (
+        {"required_skills": None, "responsibilities": None, "languages": None, "experience": None, "seniority_level": None},
+        _job(),
+    ),
+    "nested none lists": ({"required_skills": {"technical": None, "soft": None}}, _job()),
+    "top-level skill lists": (
+        {"technical_skills": ["Go"], "soft_skills": ["Mentoring"]},
+        _job(["Go"], ["Mentoring"]),
+    ),
+    "nested wins over top-level": (
+        {"required_skills": {"technical": ["Python"]}, "technical_skills": ["Go"], "soft_skills": ["Mentoring"]},
+        _job(["Python"], ["Mentoring"]),
+    ),
+    "flat skills": ({"skills": ["Rust", "SQL"]}, _job(["Rust", "SQL"])),
+    "flat skills ignored when soft given": ({"skills": ["Rust"], "soft_skills": ["Patience"]}, _job([], ["Patience"])),
+    "flat skills not a list": ({"skills": "Rust"}, _job()),
+    "tasks": ({"tasks": ["Ship"], "requirements": ["Other"]}, _job(responsibilities=["Ship"])),
+    "requirements": ({"tasks": [], "requirements": ["Own on-call"]}, _job(responsibilities=["Own on-call"])),
+    "tasks not a list": ({"tasks": "Ship", "requirements": ["Own"]}, _job(responsibilities=["Own"])),
+    "language_requirements": ({"language_requirements": ["German"]}, _job(languages=["German"])),
+    "languages win": ({"languages": ["Dutch"], "language_requirements": ["German"]}, _job(languages=["Dutch"])),
+    "tuple lists": ({"required_skills": {"technical": ("C",)}}, _job(["C"])),
+    "nested experience": (
+        {"experience": {"minimum_years": 5, "industry": "health"}},
+        _job(experience={"minimum_years": 5, "industry": "health", "type": None, "leadership": None}),
+    ),
+    # experience fields are only read from the nested object
+    "flat experience": ({"minimum_years": 5, "industry": "health"}, _job()),
+}
+
+
+@pytest.mark.parametrize("raw,expected", JOB_CASES.values(), ids=JOB_CASES.keys())
+def test_sanitize_job(raw, expected):
+    assert _sanitize_job(raw) == expected
+
+
+def _cv(fit=5, justification="", strengths=(), gaps=(), summary="", recommendations=None, **key_lists):
+    key_information = {"experience_summary": summary}
+    for name in ("technical_skills", "soft_skills", "certifications", "languages", "responsibilities"):
+        key_information[name] = list(key_lists.get(name, ()))
+    return {
+        "candidate_suitability": {"overall_fit_score": fit, "justification": justification,
+                                  "strengths": list(strengths), "gaps": list(gaps)},
+        "key_information": key_information,
+        "recommendations": recommendations or {"tailoring": [], "interview_focus": [], "career_development": []},
+    }
+
+
+CV_CASES = {
+    "empty": ({}, _cv()),
+    "none": (None, _cv()),
+    "canonical": (
+        {"candidate_suitability": {"overall_fit_score": 8, "justification": "fits", "strengths": ["a"], "gaps": ["b"]},
+         "key_information": {"experience_summary": "10y", "technical_skills": ["Python"], "languages": ["English"]},
+         "recommendations": {"tailoring": ["t"], "interview_focus": ["i"], "career_development": ["c"]}},
+        _cv(8, "fits", ["a"], ["b"], "10y", {"tailoring": ["t"], "interview_focus": ["i"], "career_development": ["c"]},
+            technical_skills=["Python"], languages=["English"]),
+    ),
+    "none values": (
+        {"candidate_suitability": None, "key_information": None, "recommendations": None},
+        _cv(),
+    ),
+    "none fields": (
+        {"candidate_suitability": {"overall_fit_score": None, "justification": None, "strengths": None},
+         "key_information": {"experience_summary": None, "soft_skills": None},
+         "recommendations": {"tailoring": None}},
+        _cv(),
+    ),
+    "zero fit score falls back to 5": ({"candidate_suitability": {"overall_fit_score": 0}}, _cv()),
+    "recommendations list": ({"recommendations": ["x", "y"]}, _cv(recommendations={
+        "tailoring": ["x", "y"], "interview_focus": [], "career_development": []})),
+    "recommendations string": ({"recommendations": "x"}, _cv()),
+    # key_information fields at the top level when the nested object is missing
+    "flat key information": (
+        {"experience_summary": "5y", "technical_skills": ["Go"], "certifications": ["CKA"]},
+        _cv(summary="5y", technical_skills=["Go"], certifications=["CKA"]),
+    ),
+    "nested key information wins": (
+        {"key_information": {"technical_skills": ["Python"]}, "technical_skills": ["Go"]},
+        _cv(technical_skills=["Python"]),
+    ),
+}
+
+
+@pytest.mark.parametrize("raw,expected", CV_CASES.values(), ids=CV_CASES.keys())
+def test_sanitize_cv(raw, expected):
+    assert _sanitize_cv(raw) == expected
+
+
+@pytest.mark.parametrize("d,expected", [
+    ({"a": ["x"], "b": ["y"]}, ["x"]),
+    ({"a": [], "b": ["y"]}, ["y"]),
+    ({"a": "x", "b": None}, []),
+    ({}, []),
+])
+def test_first_list(d, expected):
+    assert _first_list(d, ("a", "b")) == expected
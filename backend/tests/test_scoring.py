@@ -0,0 +1,43 @@
+import pytest
+
+import agents
+from conftest import make_score
+
+
+@pytest.mark.parametrize("overalls,expected", [
+    ([70], 70),
+    ([30, 90, 60], 60),            # odd: the middle vote
+    ([90, 30, 60, 40], 40),        # even: the lower of the two middle votes (median_low)
+    ([50, 50, 80], 50),            # tie on the median value
+])
+def test_median_overall(overalls, expected):
+    assert agents._median_score([make_score(o) for o in overalls]).overall_match_score == expected
+
+
+def test_each_score_field_is_its_own_median():
+    votes = [
+        make_score(60, technical_skills_score=90, experience_score=10),
+        make_score(40, technical_skills_score=20, experience_score=50),
+        make_score(80, technical_skills_score=30, experience_score=70),
+    ]
+    result = agents._median_score(votes)
+    assert (result.overall_match_score, result.technical_skills_score, result.experience_score) == (60, 30, 50)
+
+
+def test_text_comes_from_the_median_overall_vote():
+    votes = [
+        make_score(20, overall_explanation="low", strengths=["a"]),
+        make_score(60, overall_explanation="mid", strengths=["b"]),
+        make_score(90, overall_explanation="high", strengths=["c"]),
+    ]
+    result = agents._median_score(votes)
+    assert (result.overall_explanation, result.strengths) == ("mid", ["b"])
+
+
+def test_tied_median_takes_the_first_matching_vote():
+    votes = [
+        make_score(90, overall_explanation="high"),
+        make_score(50, overall_explanation="first 50"),
+        make_score(50, overall_explanation="second 50"),
+    ]
+    assert agents._median_score(votes).overall_explanation == "first 50"
@@ -0,0 +1,106 @@
+import asyncio
+import types
+
+import pytest
+
+import semantic_cache
+from semantic_cache import SemanticCache
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_threshold_hit_and_miss():
+    cache = SemanticCache(threshold=0.97)
+    _run(cache.add("ns", "a", [1.0, 0.0], "value-a"))
+    # vectors are normalized, so scale does not matter
+    assert _run(cache.lookup("ns", [5.0, 0.1])) == "value-a"        # cosine ~0.9998
+    assert _run(cache.lookup("ns", [1.0, 0.5])) is None             # cosine ~0.894
+
+
+def test_nearest_entry_wins():
+    cache = SemanticCache(threshold=0.9)
+    _run(cache.add("ns", "a", [1.0, 0.2], "value-a"))
+    _run(cache.add("ns", "b", [1.0, 0.0], "value-b"))
+    assert _run(cache.lookup("ns", [1.0, 0.01])) == "value-b"
+
+
+def test_namespaces_are_isolated():
+    cache = SemanticCache(threshold=0.9)
+    _run(cache.add("vacancy:gpt-4o", "a", [1.0, 0.0], "gpt-4o result"))
+    assert _run(cache.lookup("vacancy:gpt-4.1-mini", [1.0, 0.0])) is None
+    assert _run(cache.lookup("vacancy:gpt-4o", [1.0, 0.0])) == "gpt-4o result"
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache.time, "monotonic", lambda: now[0])
+    cache = SemanticCache(ttl_seconds=60, threshold=0.9)
+    _run(cache.add("ns", "a", [1.0, 0.0], "value-a"))
+    now[0] += 59
+    assert _run(cache.lookup("ns", [1.0, 0.0])) == "value-a"
+    now[0] += 2
+    assert _run(cache.lookup("ns", [1.0, 0.0])) is None
+    assert not cache._store
+
+
+def test_large_namespace_is_scanned_off_the_loop(monkeypatch):
+    calls = []
+    to_thread = asyncio.to_thread
+
+    async def spy(fn, *args):
+        calls.append(fn)
+        return await to_thread(fn, *args)
+
+    monkeypatch.setattr(semantic_cache.asyncio, "to_thread", spy)
+    cache = SemanticCache(threshold=0.99)
+    for i in range(semantic_cache._SCAN_INLINE_MAX + 1):
+        _run(cache.add("ns", str(i), [1.0, float(i)], i))
+    assert _run(cache.lookup("ns", [1.0, 3.0])) == 3
+    assert calls == [semantic_cache._nearest]
+
+
+class CountingClient:
+    def __init__(self):
+        self.inputs: list[str] = []
+        self.embeddings = types.SimpleNamespace(create=self._create)
+
+    async def _create(self, model, input, dimensions):
+        self.inputs.append(input)
+        return types.SimpleNamespace(data=[types.SimpleNamespace(embedding=[float(len(input)), 1.0])])
+
+
+@pytest.fixture
+def memo(monkeypatch):
+    memo = type(semantic_cache._embedding_memo)()
+    monkeypatch.setattr(semantic_cache, "_embedding_memo", memo)
+    monkeypatch.setattr(semantic_cache, "_LOCAL_BACKEND", False)
+    return memo
+
+
+def test_embed_memoizes_normalized_text(memo):
+    client = CountingClient()
+    first = _run(semantic_cache.embed(client, "Senior  Python\nDeveloper"))
+    # formatting-only edits normalize to the same text: no second API call
+    assert _run(semantic_cache.embed(client, "senior python developer ")) == first
+    assert client.inputs == ["senior python developer"]
+
+
+def test_embed_memo_is_lru_bounded(memo, monkeypatch):
+    monkeypatch.setattr(semantic_cache, "_EMBEDDING_MEMO_SIZE", 2)
+    client = CountingClient()
+    for text in ("a", "b", "a", "c", "a", "b"):
+        _run(semantic_cache.embed(client, text))
+    # "b" was the least recently used when "c" arrived
+    assert client.inputs == ["a", "b", "c", "b"]
+    assert len(memo) == 2
+
+
+def test_embed_failure_is_not_memoized(memo):
+    async def failing(**kwargs):
+        raise RuntimeError("embeddings down")
+
+    client = types.SimpleNamespace(embeddings=types.SimpleNamespace(create=failing))
+    assert _run(semantic_cache.embed(client, "text")) is None
+    assert not memo